@@ -1,6 +1,7 @@
 import numpy as np
 from PIL import Image
 import sys
+from kernels import diff_stats, pearson
 
 def calculate_all_metrics(original_path, encrypted_path):
     """Calculate all security metrics"""
@@ -10,19 +11,21 @@ def calculate_all_metrics(original_path, encrypted_path):
     encrypted = Image.open(encrypted_path)
     
     # Convert to numpy arrays
-    orig_array = np.array(original)
-    enc_array = np.array(encrypted)
+    orig_array = np.asarray(original)
+    enc_array = np.asarray(encrypted)
     
-    # 1. NPCR
-    diff_pixels = np.sum(orig_array != enc_array)
+    # NPCR, UACI and MSE share a single pass over both arrays
+    diff_pixels, abs_sum, sq_sum = diff_stats(orig_array, enc_array)
     total_pixels = orig_array.size
+    
+    # 1. NPCR
     npcr = (diff_pixels / total_pixels) * 100
     
     # 2. UACI
-    uaci = (np.sum(np.abs(orig_array.astype(float) - enc_array.astype(float))) / (total_pixels * 255)) * 100
+    uaci = (abs_sum / (total_pixels * 255)) * 100
     
     # 3. MSE
-    mse = np.mean((orig_array.astype(float) - enc_array.astype(float)) ** 2)
+    mse = sq_sum / total_pixels
     
     # 4. PSNR
     if mse == 0:
@@ -30,10 +33,8 @@ def calculate_all_metrics(original_path, encrypted_path):
     else:
         psnr = 10 * np.log10((255 ** 2) / mse)
     
-    # 5. Correlation (horizontal)
-    x = orig_array[:, :-1].flatten()
-    y = orig_array[:, 1:].flatten()
-    correlation = abs(np.corrcoef(x, y)[0, 1])
+    # 5. Correlation (horizontal), computed on views without copying
+    correlation = abs(pearson(orig_array[:, :-1], orig_array[:, 1:]))
     
     # 6. Key Space (AES-256)
     key_space = 256  # 2^256 represented as power
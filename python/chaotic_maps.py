@@ -1,5 +1,15 @@
+import os
+from pathlib import Path
 import numpy as np
 from PIL import Image
+from kernels import njit
+
+# On-disk cache of generated index sequences (they depend only on the map and shape)
+CACHE_DIR = Path.home() / '.cache' / 'hybrid_enc'
+
+# Total size the cache may grow to before the least recently used sequences
+# are evicted (one int64 sequence of a 12 MP RGB image is ~290 MB)
+CACHE_MAX_BYTES = 1 << 30
 
 def logistic_map(x, r=3.99):
     """Logistic map: x(n+1) = r * x(n) * (1 - x(n))"""
@@ -24,6 +34,138 @@ def henon_map(x, y, a=1.4, b=0.3):
     y_new = b * x
     return x_new, y_new
 
+@njit(cache=True)
+def _logistic_indices(n, x0=0.5, r=3.99):
+    """Index sequence from iterating the logistic map n times"""
+    out = np.empty(n, np.int64)
+    x = x0
+    for i in range(n):
+        x = r * x * (1 - x)
+        out[i] = int(x * n) % n
+    return out
+
+@njit(cache=True)
+def _tent_indices(n, x0=0.5, mu=2.0):
+    """Index sequence from iterating the tent map n times"""
+    out = np.empty(n, np.int64)
+    x = x0
+    for i in range(n):
+        if x < 0.5:
+            x = mu * x
+        else:
+            x = mu * (1 - x)
+        out[i] = int(x * n) % n
+    return out
+
+@njit(cache=True)
+def _henon_indices(n, x0=0.5, y0=0.5, a=1.4, b=0.3):
+    """Index sequence from iterating the Henon map n times"""
+    out = np.empty(n, np.int64)
+    x, y = x0, y0
+    for i in range(n):
+        x, y = 1 - a * (x * x) + y, b * x
+        out[i] = int(abs(x) * n) % n
+    return out
+
+@njit(cache=True)
+def _arnold_indices(height, width, channels, iterations=5):
+    """Index sequence from moving each pixel through the Arnold cat map"""
+    out = np.empty(height * width * channels, np.int64)
+    k = 0
+    for i in range(height):
+        for j in range(width):
+            x = i / height
+            y = j / width
+            for _ in range(iterations):
+                x, y = (x + y) % 1, (x + 2 * y) % 1
+            new_i = int(x * height) % height
+            new_j = int(y * width) % width
+            for c in range(channels):
+                out[k] = (new_i * width + new_j) * channels + c
+                k += 1
+    return out
+
+# Index generators keyed by map type, all called as (height, width, channels, iterations)
+_DISPATCH = {
+    'logistic': lambda h, w, c, iterations: _logistic_indices(h * w * c),
+    'tent': lambda h, w, c, iterations: _tent_indices(h * w * c),
+    'henon': lambda h, w, c, iterations: _henon_indices(h * w * c),
+    'arnold': _arnold_indices,
+}
+
+def _chaotic_indices(shape, map_type, iterations):
+    """
+    Scramble permutation for an image shape; unknown map types fall back to logistic
+    
+    The raw map sequences repeat indices, so a gather through them would
+    drop pixels and a scatter could not undo it. Stably sorting the sequence
+    turns it into a true permutation that still follows the chaotic order.
+    
+    Permutations are cached as .npy files under CACHE_DIR and memory-mapped
+    on later calls, so repeated sizes skip generation entirely.
+    """
+    height, width = shape[:2]
+    channels = shape[2] if len(shape) == 3 else 1
+    if map_type not in _DISPATCH:
+        map_type = 'logistic'
+    
+    # Only the Arnold map depends on the 2D layout and iteration count
+    if map_type == 'arnold':
+        key = f'perm_arnold_{height}x{width}x{channels}_{iterations}'
+    else:
+        key = f'perm_{map_type}_{height * width * channels}'
+    path = CACHE_DIR / f'{key}.npy'
+    
+    try:
+        indices = np.load(path, mmap_mode='r')
+    except (OSError, ValueError):
+        pass
+    else:
+        # Bump the mtime so eviction sees the sequence as recently used; a
+        # read-only cache still serves the sequence it already holds
+        try:
+            os.utime(path)
+        except OSError:
+            pass
+        return indices
+    
+    indices = np.argsort(_DISPATCH[map_type](height, width, channels, iterations), kind='stable')
+    
+    # Write to a temp file and rename so concurrent readers never see a partial file
+    tmp_path = CACHE_DIR / f'{key}.{os.getpid()}.tmp.npy'
+    try:
+        CACHE_DIR.mkdir(parents=True, exist_ok=True)
+        np.save(tmp_path, indices)
+        os.replace(tmp_path, path)
+        _evict_cache(path)
+    except OSError:
+        pass
+    finally:
+        # Only left behind when the save or rename failed (e.g. a full disk)
+        tmp_path.unlink(missing_ok=True)
+    
+    return indices
+
+def _evict_cache(keep):
+    """Delete least recently used sequences until the cache fits CACHE_MAX_BYTES"""
+    entries = []
+    for entry in CACHE_DIR.glob('*.npy'):
+        if entry.name.endswith('.tmp.npy') or entry == keep:
+            continue
+        try:
+            stat = entry.stat()
+        except OSError:
+            continue
+        entries.append((stat.st_mtime, stat.st_size, entry))
+    
+    total = keep.stat().st_size + sum(size for _, size, _ in entries)
+    for _, size, entry in sorted(entries):
+        if total <= CACHE_MAX_BYTES:
+            break
+        # Readers that already mapped the file keep their view of it
+        entry.unlink(missing_ok=True)
+        total -= size
+
 def apply_chaotic_scramble(img_array, map_type='logistic', iterations=5):
     """
     Apply chaotic scrambling to image pixels
@@ -37,60 +179,16 @@ def apply_chaotic_scramble(img_array, map_type='logistic', iterations=5):
         scrambled numpy array
     """
     try:
-        height, width = img_array.shape[:2]
-        channels = img_array.shape[2] if len(img_array.shape) == 3 else 1
-        
         # Flatten image
-        flat_img = img_array.flatten()
+        flat_img = img_array.ravel()
         total_pixels = len(flat_img)
         
         # Generate chaotic sequence
-        if map_type == 'logistic':
-            x = 0.5  # Initial value
-            indices = []
-            for _ in range(total_pixels):
-                x = logistic_map(x)
-                indices.append(int(x * total_pixels) % total_pixels)
-        
-        elif map_type == 'arnold':
-            # Arnold Cat Map for 2D scrambling
-            indices = []
-            for i in range(height):
-                for j in range(width):
-                    x = i / height
-                    y = j / width
-                    for _ in range(iterations):
-                        x, y = arnold_cat_map(x, y)
-                    new_i = int(x * height) % height
-                    new_j = int(y * width) % width
-                    if channels == 1:
-                        indices.append(new_i * width + new_j)
-                    else:
-                        for c in range(channels):
-                            indices.append((new_i * width + new_j) * channels + c)
-        
-        elif map_type == 'tent':
-            x = 0.5
-            indices = []
-            for _ in range(total_pixels):
-                x = tent_map(x)
-                indices.append(int(x * total_pixels) % total_pixels)
-        
-        elif map_type == 'henon':
-            x, y = 0.5, 0.5
-            indices = []
-            for _ in range(total_pixels):
-                x, y = henon_map(x, y)
-                indices.append(int(abs(x) * total_pixels) % total_pixels)
+        indices = _chaotic_indices(img_array.shape, map_type, iterations)
         
-        else:
-            # Default to logistic
-            return apply_chaotic_scramble(img_array, 'logistic', iterations)
-        
-        # Scramble pixels
-        scrambled_flat = np.zeros_like(flat_img)
-        for i, idx in enumerate(indices[:total_pixels]):
-            scrambled_flat[i] = flat_img[idx]
+        # Scramble pixels (single vectorized gather)
+        idx_arr = np.asarray(indices, dtype=np.intp)[:total_pixels]
+        scrambled_flat = flat_img[idx_arr]
         
         # Reshape back to original dimensions
         scrambled = scrambled_flat.reshape(img_array.shape)
@@ -115,25 +213,16 @@ def reverse_chaotic_scramble(scrambled_array, map_type='logistic', iterations=5)
     """
     try:
         # Generate same chaotic sequence
-        total_pixels = len(scrambled_array.flatten())
+        total_pixels = scrambled_array.size
         
-        if map_type == 'logistic':
-            x = 0.5
-            indices = []
-            for _ in range(total_pixels):
-                x = logistic_map(x)
-                indices.append(int(x * total_pixels) % total_pixels)
-        
-        # Add similar logic for other maps...
-        else:
-            indices = list(range(total_pixels))
+        indices = _chaotic_indices(scrambled_array.shape, map_type, iterations)
         
-        # Reverse scrambling
-        flat_scrambled = scrambled_array.flatten()
-        original_flat = np.zeros_like(flat_scrambled)
+        # Reverse scrambling (single vectorized scatter through the permutation)
+        flat_scrambled = scrambled_array.ravel()
+        original_flat = np.empty_like(flat_scrambled)
         
-        for i, idx in enumerate(indices[:total_pixels]):
-            original_flat[idx] = flat_scrambled[i]
+        idx_arr = np.asarray(indices, dtype=np.intp)[:total_pixels]
+        original_flat[idx_arr] = flat_scrambled
         
         # Reshape
         original_shape = scrambled_array.shape
@@ -148,7 +237,7 @@ def reverse_chaotic_scramble(scrambled_array, map_type='logistic', iterations=5)
 def visualize_scrambling(image_path, output_path, map_type='logistic'):
     """Helper function to visualize scrambling effect"""
     img = Image.open(image_path)
-    img_array = np.array(img)
+    img_array = np.asarray(img)
     
     scrambled = apply_chaotic_scramble(img_array, map_type)
     
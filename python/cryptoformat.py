@@ -0,0 +1,132 @@
+# python/cryptoformat.py - on-disk format definitions shared by the .bin
+# (encryption.py) and stego (steganography.py) paths; both must agree on
+# these byte for byte or one of the two formats stops decrypting
+import functools
+import hashlib
+import numpy as np
+from PIL import Image
+from kernels import fisher_yates
+
+# Cipher recorded in the metadata of files and payloads written by this
+# version. Those without a 'cipher' field are legacy AES-256-CBC with a
+# 16-byte IV.
+CIPHER_NAME = 'AES-256-GCM'
+
+# 'aad' value of GCM files and payloads that authenticate their own metadata
+# JSON as associated data, so a flipped seed, shape or mode fails the tag
+# check. GCM metadata without it only had the ciphertext authenticated.
+AAD_METADATA = 'metadata'
+
+# Key derivation recorded in the metadata. Files and payloads without a
+# 'kdf' field used the UTF-8 key truncated or zero-padded to 32 bytes.
+KDF_NAME = 'SHA-256'
+
+def derive_key(key, kdf=KDF_NAME):
+    """AES-256 key for a passphrase under the given metadata 'kdf' value"""
+    if kdf == KDF_NAME:
+        return hashlib.sha256(key.encode('utf-8')).digest()
+    return key.encode('utf-8')[:32].ljust(32, b'\0')
+
+# zlib level for every PNG written: level 1 writes several times faster than
+# PIL's default of 6 for a modest size increase (the LSB-noisy stego output
+# barely compresses at any level)
+PNG_COMPRESS_LEVEL = 1
+
+# PIL modes whose bands are all 8-bit, so Image.histogram() has 256 bins per band
+BYTE_MODES = ('L', 'P', 'LA', 'PA', 'RGB', 'RGBA', 'RGBX', 'CMYK', 'YCbCr', 'LAB', 'HSV')
+
+def calculate_entropy(data):
+    """Calculate Shannon entropy of an array or PIL image"""
+    if isinstance(data, Image.Image) and data.mode in BYTE_MODES:
+        # PIL counts the pixels in C; pool the per-band bins so the result
+        # matches the array path, which treats every byte as one sample
+        hist = np.asarray(data.histogram()).reshape(-1, 256).sum(axis=0)
+    else:
+        # Convert to flat array
+        flat_data = np.asarray(data).ravel()
+        
+        # Calculate histogram (bincount counts byte values directly)
+        if flat_data.dtype == np.uint8:
+            hist = np.bincount(flat_data, minlength=256)
+        else:
+            hist, _ = np.histogram(flat_data, bins=256, range=(0, 256))
+    
+    return entropy_from_counts(hist)
+
+def entropy_from_counts(hist):
+    """Shannon entropy in bits of a histogram of byte-value counts"""
+    # Remove zero bins
+    hist = hist[hist > 0]
+    if hist.size == 0:
+        return 0.0
+    
+    # Normalize
+    hist = hist / hist.sum()
+    
+    # Calculate entropy
+    entropy = -np.sum(hist * np.log2(hist))
+    
+    return float(entropy)
+
+# AES output is uniform, so from this size on its measured entropy rounds
+# to 8.0 at the reported 4 decimals (urandom data still shows 7.9999 now and
+# then at 4 MiB, never at 8 MiB) and the extra pass over it is skipped
+ENTROPY_ESTIMATE_MIN = 1 << 23
+
+def ciphertext_entropy(data):
+    """Entropy of AES output: 8.0 for large payloads, measured for small ones"""
+    if len(data) >= ENTROPY_ESTIMATE_MIN:
+        return 8.0
+    return calculate_entropy(np.frombuffer(data, dtype=np.uint8))
+
+@functools.lru_cache(maxsize=8)
+def _perm(n):
+    """Legacy seeded permutation of n indices, built once per size"""
+    # RandomState(42) reproduces the np.random.seed(42) sequence used by files
+    # written before the Philox scramble; only decryption still needs it
+    perm = np.random.RandomState(42).permutation(n)
+    perm.flags.writeable = False
+    return perm
+
+@functools.lru_cache(maxsize=8)
+def _inv_perm(n):
+    """Inverse of _perm(n), so unscrambling is a gather instead of a scatter"""
+    inv = np.empty(n, dtype=np.intp)
+    inv[_perm(n)] = np.arange(n)
+    inv.flags.writeable = False
+    return inv
+
+# Scramble recorded in the metadata of files and payloads written by this
+# version: a Fisher-Yates shuffle of the whole image driven by raw Philox
+# output (kernels.fisher_yates), seeded by 'scramble_seed'. Files without a
+# 'scramble' field use the legacy RandomState(42) permutation.
+SCRAMBLE_NAME = 'fisher-yates-philox'
+
+def simple_scramble(image_array, seed):
+    """Shuffle all pixels with the seeded Fisher-Yates of SCRAMBLE_NAME"""
+    flat = image_array.flatten()
+    fisher_yates(flat, seed)
+    return flat.reshape(image_array.shape)
+
+def simple_unscramble(scrambled_array, seed=None):
+    """Reverse the scrambling; seed=None means the legacy whole-image permutation"""
+    flat = scrambled_array.reshape(-1)
+    if seed is None:
+        return flat[_inv_perm(flat.size)].reshape(scrambled_array.shape)
+    
+    # Replay the same swaps on the positions to learn where each pixel went,
+    # then scatter the pixels back
+    perm = np.arange(flat.size, dtype=np.int32 if flat.size < 2**31 else np.int64)
+    fisher_yates(perm, seed)
+    original = np.empty_like(flat)
+    original[perm] = flat
+    return original.reshape(scrambled_array.shape)
+
+def unscramble_image(img_array, metadata):
+    """Undo the scramble named by the metadata of a decrypted file or payload"""
+    scramble = metadata.get('scramble')
+    if scramble == SCRAMBLE_NAME:
+        return simple_unscramble(img_array, metadata['scramble_seed'])
+    if scramble is None and 'scramble_seed' not in metadata:
+        return simple_unscramble(img_array)
+    raise ValueError(f'Unsupported scramble: {scramble}')
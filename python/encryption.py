@@ -2,97 +2,86 @@ import sys
 import json
 import numpy as np
 from PIL import Image
-from Crypto.Cipher import AES
-from Crypto.Random import get_random_bytes
-from Crypto.Util.Padding import pad, unpad
+from cryptography.hazmat.primitives.ciphers import Cipher, algorithms, modes
+from cryptography.hazmat.primitives.padding import PKCS7
+from cryptography.exceptions import InvalidTag
 import os
-
-def calculate_entropy(data):
-    """Calculate Shannon entropy"""
-    if len(data) == 0:
-        return 0.0
-    
-    # Convert to flat array
-    flat_data = np.array(data).flatten()
-    
-    # Calculate histogram
-    hist, _ = np.histogram(flat_data, bins=256, range=(0, 256))
-    
-    # Remove zero bins
-    hist = hist[hist > 0]
-    
-    # Normalize
-    hist = hist / hist.sum()
-    
-    # Calculate entropy
-    entropy = -np.sum(hist * np.log2(hist))
-    
-    return float(entropy)
-
-def simple_scramble(image_array):
-    """Simple chaotic scrambling using logistic map"""
-    flat = image_array.flatten()
-    np.random.seed(42)
-    indices = np.random.permutation(len(flat))
-    scrambled = flat[indices]
-    return scrambled.reshape(image_array.shape), indices
-
-def simple_unscramble(scrambled_array, indices):
-    """Reverse the scrambling"""
-    flat = scrambled_array.flatten()
-    original = np.zeros_like(flat)
-    original[indices] = flat
-    return original.reshape(scrambled_array.shape)
+import mmap
+from cryptoformat import (
+    AAD_METADATA,
+    CIPHER_NAME,
+    KDF_NAME,
+    PNG_COMPRESS_LEVEL,
+    SCRAMBLE_NAME,
+    calculate_entropy,
+    ciphertext_entropy,
+    derive_key,
+    simple_scramble,
+    unscramble_image,
+)
 
 def encrypt_image(image_path, key, chaotic_map='logistic'):
     """Encrypt image to .bin file with metrics"""
     try:
         # Load image
         img = Image.open(image_path)
-        img_array = np.array(img)
         
-        # Calculate original entropy
-        original_entropy = calculate_entropy(img_array)
+        # Calculate original entropy (straight from PIL's histogram)
+        original_entropy = calculate_entropy(img)
+        
+        img_array = np.asarray(img)
         
-        # Store metadata
+        # Store metadata (the scramble seed is not secret; AES provides confidentiality)
+        scramble_seed = int.from_bytes(os.urandom(8), byteorder='big')
         metadata = {
             'mode': img.mode,
             'shape': list(img_array.shape),
-            'dtype': str(img_array.dtype)
+            'dtype': str(img_array.dtype),
+            'cipher': CIPHER_NAME,
+            'aad': AAD_METADATA,
+            'kdf': KDF_NAME,
+            'scramble': SCRAMBLE_NAME,
+            'scramble_seed': scramble_seed
         }
         
         # Scramble
-        scrambled, indices = simple_scramble(img_array)
-        
-        # Convert to bytes
-        img_bytes = scrambled.tobytes()
+        scrambled = simple_scramble(img_array, scramble_seed)
         
         # Prepare metadata
         metadata_json = json.dumps(metadata).encode('utf-8')
         metadata_length = len(metadata_json)
         
-        # AES encryption
-        key_bytes = key.encode('utf-8')[:32].ljust(32, b'\0')
-        cipher = AES.new(key_bytes, AES.MODE_CBC)
-        iv = cipher.iv
-        
-        # Pad and encrypt
-        padded_data = pad(img_bytes, AES.block_size)
-        encrypted_data = cipher.encrypt(padded_data)
+        # AES-GCM encryption: counter-mode blocks are independent (so OpenSSL
+        # can pipeline them) and need no padding; the tag, which also covers the
+        # metadata as associated data, catches a wrong key or a tampered header
+        key_bytes = derive_key(key)
+        nonce = os.urandom(12)
+        encryptor = Cipher(algorithms.AES(key_bytes), modes.GCM(nonce)).encryptor()
+        encryptor.authenticate_additional_data(metadata_json)
+        
+        # Encrypt straight from the scrambled pixel buffer into a preallocated
+        # one (update_into needs one block of slack)
+        plain_data = scrambled.reshape(-1).view(np.uint8)
+        encrypted_buffer = np.empty(plain_data.size + 15, dtype=np.uint8)
+        encrypted_length = encryptor.update_into(plain_data, encrypted_buffer)
+        encryptor.finalize()
+        tag = encryptor.tag
+        encrypted_data = encrypted_buffer[:encrypted_length]
         
         # Calculate encrypted entropy
-        encrypted_entropy = calculate_entropy(np.frombuffer(encrypted_data, dtype=np.uint8))
+        encrypted_entropy = ciphertext_entropy(encrypted_data)
         
         # Save encrypted file
         base_name = os.path.splitext(image_path)[0]
         output_path = f"{base_name}_encrypted.bin"
         
         with open(output_path, 'wb') as f:
-            # Write: metadata_length(4 bytes) + metadata + IV + encrypted_data
+            # Write: metadata_length(4 bytes) + metadata + nonce(12) + tag(16) + encrypted_data
             f.write(metadata_length.to_bytes(4, byteorder='big'))
             f.write(metadata_json)
-            f.write(iv)
-            f.write(encrypted_data)
+            f.write(nonce)
+            f.write(tag)
+            f.write(memoryview(encrypted_data))
         
         return {
             'success': True,
@@ -116,48 +105,66 @@ def encrypt_image(image_path, key, chaotic_map='logistic'):
 def decrypt_image(encrypted_path, key):
     """Decrypt .bin file to image"""
     try:
-        with open(encrypted_path, 'rb') as f:
+        # Map the file instead of reading it, so the ciphertext is never
+        # copied into a Python bytes object
+        with open(encrypted_path, 'rb') as f, \
+                mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
             # Read metadata length
-            metadata_length = int.from_bytes(f.read(4), byteorder='big')
+            metadata_length = int.from_bytes(mm[:4], byteorder='big')
             
             # Read metadata
-            metadata_json = f.read(metadata_length)
+            metadata_json = mm[4:4+metadata_length]
             metadata = json.loads(metadata_json.decode('utf-8'))
             
-            # Read IV
-            iv = f.read(16)
+            # Read nonce and tag (GCM) or IV (legacy CBC)
+            offset = 4 + metadata_length
+            if metadata.get('cipher') == CIPHER_NAME:
+                mode = modes.GCM(mm[offset:offset+12], mm[offset+12:offset+28])
+                offset += 28
+            else:
+                mode = modes.CBC(mm[offset:offset+16])
+                offset += 16
             
-            # Read encrypted data
-            encrypted_data = f.read()
-        
-        # Decrypt
-        key_bytes = key.encode('utf-8')[:32].ljust(32, b'\0')
-        cipher = AES.new(key_bytes, AES.MODE_CBC, iv=iv)
-        
-        try:
-            decrypted_data = unpad(cipher.decrypt(encrypted_data), AES.block_size)
-        except ValueError as e:
-            return {
-                'success': False,
-                'error': 'Invalid key or corrupted file'
-            }
-        
-        # Reconstruct array
+            # Decrypt from the mapped file straight into a preallocated buffer
+            # (update_into needs one block of slack)
+            key_bytes = derive_key(key, metadata.get('kdf'))
+            decryptor = Cipher(algorithms.AES(key_bytes), mode).decryptor()
+            if metadata.get('aad') == AAD_METADATA:
+                decryptor.authenticate_additional_data(metadata_json)
+            
+            encrypted_data = memoryview(mm)[offset:]
+            decrypted_buffer = np.empty(len(encrypted_data) + 15, dtype=np.uint8)
+            try:
+                decrypted_length = decryptor.update_into(encrypted_data, decrypted_buffer)
+                decryptor.finalize()
+                if isinstance(mode, modes.CBC):
+                    # Only the last block carries PKCS7 padding
+                    unpadder = PKCS7(128).unpadder()
+                    last_block = decrypted_buffer[decrypted_length-16:decrypted_length].tobytes()
+                    tail = unpadder.update(last_block) + unpadder.finalize()
+                    decrypted_length += len(tail) - 16
+            except (ValueError, InvalidTag) as e:
+                return {
+                    'success': False,
+                    'error': 'Invalid key or corrupted file'
+                }
+            finally:
+                encrypted_data.release()
+        
+        # Reconstruct array as a view of the decrypted buffer
         shape = tuple(metadata['shape'])
         dtype = np.dtype(metadata['dtype'])
-        img_array = np.frombuffer(decrypted_data, dtype=dtype).reshape(shape)
+        img_array = decrypted_buffer[:decrypted_length].view(dtype).reshape(shape)
         
-        # Unscramble (using same seed)
-        np.random.seed(42)
-        indices = np.random.permutation(img_array.size)
-        img_array = simple_unscramble(img_array, indices)
+        # Unscramble (as named by the metadata, or the legacy permutation)
+        img_array = unscramble_image(img_array, metadata)
         
         # Save image
         img = Image.fromarray(img_array.astype(np.uint8), mode=metadata['mode'])
         
         base_name = os.path.splitext(encrypted_path)[0]
         output_path = f"{base_name}_decrypted.png"
-        img.save(output_path)
+        img.save(output_path, compress_level=PNG_COMPRESS_LEVEL)
         
         return {
             'success': True,
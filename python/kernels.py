@@ -0,0 +1,280 @@
+import numpy as np
+
+try:
+    import numba
+    from numba import njit, prange
+    HAVE_NUMBA = True
+except ImportError:
+    # Numba is optional; without it kernels run as plain Python and the
+    # wrappers below fall back to vectorized NumPy where that is faster.
+    # fisher_yates has no vectorized form, so without Numba the scramble is
+    # a Python loop, over 10x slower than the old permutation (see there)
+    HAVE_NUMBA = False
+    prange = range
+
+    def njit(*args, **kwargs):
+        if len(args) == 1 and callable(args[0]) and not kwargs:
+            return args[0]
+        return lambda func: func
+
+def set_num_threads(n):
+    """Limit the threads the parallel kernels use in this process (no-op without Numba)"""
+    if HAVE_NUMBA:
+        numba.set_num_threads(max(1, min(n, numba.config.NUMBA_NUM_THREADS)))
+
+@njit(parallel=True, fastmath=True, cache=True)
+def _diff_stats_kernel(a, b):
+    """Single pass over two flat pixel arrays"""
+    diff_count = 0
+    abs_sum = 0
+    sq_sum = 0
+    for i in prange(a.size):
+        d = np.int64(a[i]) - np.int64(b[i])
+        if d != 0:
+            diff_count += 1
+        abs_sum += abs(d)
+        sq_sum += d * d
+    return diff_count, abs_sum, sq_sum
+
+def diff_stats(img1, img2):
+    """
+    Pixel difference statistics between two same-shaped images
+
+    Raises ValueError when the shapes differ.
+
+    Returns:
+        (changed pixel count, sum of absolute differences, sum of squared differences)
+    """
+    a = np.ascontiguousarray(img1)
+    b = np.ascontiguousarray(img2)
+    # The kernel indexes b by a's positions without bounds checks
+    if a.shape != b.shape:
+        raise ValueError(f'Shape mismatch: {a.shape} vs {b.shape}')
+    a = a.ravel()
+    b = b.ravel()
+
+    if HAVE_NUMBA:
+        diff_count, abs_sum, sq_sum = _diff_stats_kernel(a, b)
+        return int(diff_count), int(abs_sum), int(sq_sum)
+
+    # uint8 differences fit in int16 and their squares in int32, so avoid
+    # widening both inputs to 64-bit (or float) copies
+    if a.dtype == np.uint8 and b.dtype == np.uint8:
+        d = np.subtract(a, b, dtype=np.int16)
+        sq = np.square(d, dtype=np.int32)
+    else:
+        d = np.subtract(a, b, dtype=np.int64)
+        sq = np.square(d)
+    return int(np.count_nonzero(d)), int(np.abs(d).sum(dtype=np.int64)), int(sq.sum(dtype=np.int64))
+
+@njit(parallel=True, fastmath=True, cache=True)
+def _pearson_kernel(x, y):
+    """Two streaming passes over 2D (possibly strided) views: means, then centered sums"""
+    rows, cols = x.shape
+    sx = 0.0
+    sy = 0.0
+    for i in prange(rows):
+        for j in range(cols):
+            sx += x[i, j]
+            sy += y[i, j]
+    n = rows * cols
+    mx = sx / n
+    my = sy / n
+
+    sxy = 0.0
+    sxx = 0.0
+    syy = 0.0
+    for i in prange(rows):
+        for j in range(cols):
+            xc = x[i, j] - mx
+            yc = y[i, j] - my
+            sxy += xc * yc
+            sxx += xc * xc
+            syy += yc * yc
+    return sxy, sxx, syy
+
+def pearson(x, y):
+    """
+    Pearson correlation coefficient of two same-shaped arrays
+
+    Works directly on strided views such as img[:, :-1] and img[:, 1:]
+    without flattening them first. Returns 0.0 when either input is constant;
+    raises ValueError when the shapes differ.
+    """
+    x = np.asarray(x)
+    y = np.asarray(y)
+    if x.shape != y.shape:
+        raise ValueError(f'Shape mismatch: {x.shape} vs {y.shape}')
+    if x.size < 2:
+        return 0.0
+
+    if HAVE_NUMBA:
+        x2 = x.reshape(x.shape[0], -1) if x.ndim > 1 else x.reshape(1, -1)
+        y2 = y.reshape(y.shape[0], -1) if y.ndim > 1 else y.reshape(1, -1)
+        sxy, sxx, syy = _pearson_kernel(x2, y2)
+    else:
+        xc = x - x.mean()
+        yc = y - y.mean()
+        sxy = float(np.sum(xc * yc))
+        sxx = float(np.sum(xc * xc))
+        syy = float(np.sum(yc * yc))
+
+    den = np.sqrt(sxx * syy)
+    if den == 0:
+        return 0.0
+    return float(sxy / den)
+
+# Cover bytes carrying one payload byte, taken as a single word per depth
+_WORD = {1: np.uint64, 2: np.uint32}
+
+def _spread_table(depth):
+    """
+    Entry b holds the 8 // depth symbols of byte b, MSB first, laid out as the
+    cover bytes they land in and viewed as one machine word per byte
+    """
+    shifts = np.arange(8 - depth, -1, -depth, dtype=np.uint8)
+    symbols = (np.arange(256, dtype=np.uint8)[:, None] >> shifts) & ((1 << depth) - 1)
+    return np.ascontiguousarray(symbols).view(_WORD[depth]).ravel()
+
+_SPREAD = {depth: _spread_table(depth) for depth in _WORD}
+_KEEP = {depth: np.full(8 // depth, 0xFF ^ ((1 << depth) - 1), dtype=np.uint8).view(_WORD[depth])[0]
+         for depth in _WORD}
+
+@njit(parallel=True, cache=True)
+def _embed_lsb_kernel(words, data, spread, keep):
+    """In-place LSB write: one word-wide AND/OR per payload byte"""
+    for i in prange(data.size):
+        words[i] = (words[i] & keep) | spread[data[i]]
+
+# Multiplying the masked LSBs of 8 little-endian cover bytes by _GATHER
+# collects them, first cover byte highest, into the top byte of the product
+_LSB1 = np.uint64(0x0101010101010101)
+_GATHER = np.uint64(0x8040201008040201)
+
+@njit(parallel=True, cache=True)
+def _extract_lsb1_kernel(words, out, lsbs, gather):
+    """Mirror of _embed_lsb_kernel at depth 1: one multiply per output byte"""
+    for i in prange(out.size):
+        out[i] = ((words[i] & lsbs) * gather) >> np.uint64(56)
+
+@njit(parallel=True, cache=True)
+def _extract_lsb2_kernel(words, out):
+    """Mirror of _embed_lsb_kernel at depth 2: four 2-bit symbols per word"""
+    for i in prange(out.size):
+        w = words[i] & 0x03030303
+        out[i] = ((w << 6) | (w >> 4) | (w >> 14) | (w >> 24)) & 0xFF
+
+def embed_lsb(flat, data, start=0, depth=1):
+    """
+    Write the bits of the uint8 array `data`, MSB first, into the low `depth`
+    bits of flat[start:], in place; 8 // depth cover bytes per data byte
+    """
+    # Each payload byte covers exactly one word of cover bytes, so the
+    # embed is a word-wide masked OR against a 256-entry spread table
+    words = flat[start:start + data.size * (8 // depth)].view(_WORD[depth])
+    if HAVE_NUMBA:
+        _embed_lsb_kernel(words, data, _SPREAD[depth], _KEEP[depth])
+        return
+
+    np.bitwise_and(words, _KEEP[depth], out=words)
+    np.bitwise_or(words, _SPREAD[depth][data], out=words)
+
+def extract_lsb(flat, start, count, depth=1):
+    """
+    Read `count` bytes back out of the low `depth` bits of flat[start:],
+    MSB first; the inverse of embed_lsb
+    """
+    # Word arithmetic needs a fixed byte order; cover byte 0 is the low byte
+    words = flat[start:start + count * (8 // depth)].view('<u8' if depth == 1 else '<u4')
+    if HAVE_NUMBA:
+        out = np.empty(count, dtype=np.uint8)
+        if depth == 1:
+            _extract_lsb1_kernel(words, out, _LSB1, _GATHER)
+        else:
+            _extract_lsb2_kernel(words, out)
+        return out
+
+    if depth == 1:
+        return (((words & _LSB1) * _GATHER) >> np.uint64(56)).astype(np.uint8)
+    w = words & np.uint32(0x03030303)
+    return ((w << 6) | (w >> 4) | (w >> 14) | (w >> 24)).astype(np.uint8)
+
+@njit(cache=True)
+def _swap_kernel(flat, targets, top):
+    """Fisher-Yates swaps for positions top, top - 1, ... against their drawn targets"""
+    for k in range(targets.size):
+        i = top - k
+        j = targets[k]
+        tmp = flat[i]
+        flat[i] = flat[j]
+        flat[j] = tmp
+
+def fisher_yates(flat, seed, block=1 << 20):
+    """
+    Shuffle the 1D array `flat` in place with Fisher-Yates driven by Philox(seed)
+
+    Position i, from the end down to 1, swaps with (draw % (i + 1)), the draws
+    being consecutive raw 64-bit outputs of the bit generator. NumPy keeps
+    bit-generator streams stable across releases (unlike Generator.shuffle),
+    so the resulting order is fixed by this function alone. Fast only with
+    Numba; the pure Python fallback is over 10x slower than a NumPy
+    permutation.
+    """
+    bitgen = np.random.Philox(seed)
+    top = flat.size - 1
+    while top > 0:
+        draws = bitgen.random_raw(min(block, top))
+        bounds = np.arange(top + 1, top + 1 - draws.size, -1, dtype=np.uint64)
+        targets = (draws % bounds).astype(np.intp)
+        if HAVE_NUMBA:
+            _swap_kernel(flat, targets, top)
+        else:
+            # Each swap depends on the previous ones, so this cannot be
+            # vectorized. The loop costs ~0.8 s per 1 MP RGB image, on every
+            # encrypt and again on every decrypt, against ~0.05 s for the
+            # legacy RandomState permutation; install Numba (as render.yaml
+            # does) wherever that matters
+            for k, j in enumerate(targets.tolist()):
+                i = top - k
+                flat[i], flat[j] = flat[j], flat[i]
+        top -= draws.size
+
+def warm_up():
+    """
+    Compile every kernel for the array types the scripts pass in
+
+    With cache=True the machine code lands in __pycache__, so running this
+    once at build time spares each CLI invocation the JIT compile.
+    """
+    from chaotic_maps import _DISPATCH
+
+    img = np.zeros((4, 4, 3), dtype=np.uint8)
+    gray = img[..., 0].copy()
+    flat = img.reshape(-1).copy()
+
+    # Numba compiles read-only arrays (np.asarray of a PIL image,
+    # np.frombuffer of bytes) separately from writable ones, so warm both
+    for writable in (True, False):
+        a = img.copy()
+        g = gray.copy()
+        f = flat.copy()
+        for arr in (a, g, f):
+            arr.setflags(write=writable)
+        diff_stats(a, a)
+        pearson(a[:, :-1], a[:, 1:])
+        pearson(g[:, :-1], g[:, 1:])
+        pearson(f, f)
+        embed_lsb(flat, f[:1], 0)
+        embed_lsb(flat, f[:1], 8, 2)
+        extract_lsb(f, 0, 1)
+        extract_lsb(f, 8, 1, 2)
+
+    fisher_yates(flat, 1)
+    fisher_yates(np.arange(flat.size, dtype=np.int32), 1)
+    fisher_yates(np.arange(flat.size, dtype=np.int64), 1)
+
+    for generate in _DISPATCH.values():
+        generate(4, 4, 3, 1)
+
+if __name__ == '__main__':
+    warm_up()
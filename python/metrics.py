@@ -3,29 +3,18 @@ from PIL import Image
 import sys
 import json
 import os
-
-def calculate_entropy(data):
-    """Calculate Shannon entropy"""
-    if len(data) == 0:
-        return 0.0
-    hist, _ = np.histogram(data.flatten(), bins=256, range=(0, 256))
-    hist = hist[hist > 0]
-    hist = hist / hist.sum()
-    entropy = -np.sum(hist * np.log2(hist))
-    return float(entropy)
+from kernels import diff_stats, pearson
+from cryptoformat import calculate_entropy
 
 def calculate_npcr_uaci(img1, img2):
     """Calculate NPCR and UACI between two images"""
     if img1.shape != img2.shape:
         return 0.0, 0.0
     
-    # NPCR
-    diff = (img1 != img2).astype(int)
-    npcr = (np.sum(diff) / diff.size) * 100
-    
-    # UACI
-    abs_diff = np.abs(img1.astype(float) - img2.astype(float))
-    uaci = (np.sum(abs_diff) / (diff.size * 255)) * 100
+    # NPCR and UACI from one pass over both images
+    diff_count, abs_sum, _ = diff_stats(img1, img2)
+    npcr = (diff_count / img1.size) * 100
+    uaci = (abs_sum / (img1.size * 255)) * 100
     
     return float(npcr), float(uaci)
 
@@ -34,7 +23,8 @@ def calculate_mse_psnr(img1, img2):
     if img1.shape != img2.shape:
         return 0.0, 0.0
     
-    mse = np.mean((img1.astype(float) - img2.astype(float)) ** 2)
+    _, _, sq_sum = diff_stats(img1, img2)
+    mse = sq_sum / img1.size
     
     if mse == 0:
         psnr = 100.0
@@ -48,42 +38,35 @@ def calculate_correlation(img, direction='horizontal'):
     if len(img.shape) == 3:
         img = np.mean(img, axis=2).astype(np.uint8)
     
+    # Adjacent-pixel pairs as views; pearson() streams over every pair
     if direction == 'horizontal' and img.shape[1] > 1:
-        x = img[:, :-1].flatten()
-        y = img[:, 1:].flatten()
+        x = img[:, :-1]
+        y = img[:, 1:]
     elif img.shape[0] > 1:
-        x = img[:-1, :].flatten()
-        y = img[1:, :].flatten()
+        x = img[:-1, :]
+        y = img[1:, :]
     else:
         return 0.0
     
-    # Sample for performance
-    if len(x) > 5000:
-        indices = np.random.choice(len(x), 5000, replace=False)
-        x, y = x[indices], y[indices]
-    
-    if len(x) < 2:
-        return 0.0
-    
-    return float(np.corrcoef(x, y)[0, 1])
+    return pearson(x, y)
 
 def analyze_encryption(original_path, encrypted_path):
     """Analyze encryption quality"""
     try:
         # Load original image
         original_img = Image.open(original_path)
-        original_array = np.array(original_img)
+        original_array = np.asarray(original_img)
         
         # Load encrypted data (binary file)
         with open(encrypted_path, 'rb') as f:
             encrypted_data = np.frombuffer(f.read(), dtype=np.uint8)
         
         # Calculate metrics
-        original_entropy = calculate_entropy(original_array)
+        original_entropy = calculate_entropy(original_img)
         encrypted_entropy = calculate_entropy(encrypted_data)
         
         # For NPCR/UACI, compare original with encrypted (resized to match)
-        flat_original = original_array.flatten()
+        flat_original = original_array.ravel()
         min_len = min(len(flat_original), len(encrypted_data))
         npcr, uaci = calculate_npcr_uaci(
             flat_original[:min_len].reshape(-1, 1),
@@ -118,8 +101,8 @@ def analyze_steganography(original_path, stego_path):
         original_img = Image.open(original_path)
         stego_img = Image.open(stego_path)
         
-        original_array = np.array(original_img)
-        stego_array = np.array(stego_img)
+        original_array = np.asarray(original_img)
+        stego_array = np.asarray(stego_img)
         
         mse, psnr = calculate_mse_psnr(original_array, stego_array)
         
@@ -1,199 +1,316 @@
 # python/steganography.py - FIXED VERSION
 import sys
 import json
+import logging
 import numpy as np
 from PIL import Image
-from Crypto.Cipher import AES
-from Crypto.Util.Padding import pad, unpad
+from cryptography.hazmat.primitives.ciphers import Cipher, algorithms, modes
+from cryptography.hazmat.primitives.padding import PKCS7
+from cryptography.exceptions import InvalidTag
 import os
 import io
+from kernels import embed_lsb, extract_lsb, set_num_threads
+from cryptoformat import (
+    AAD_METADATA,
+    CIPHER_NAME,
+    ENTROPY_ESTIMATE_MIN,
+    KDF_NAME,
+    PNG_COMPRESS_LEVEL,
+    SCRAMBLE_NAME,
+    calculate_entropy,
+    derive_key,
+    entropy_from_counts,
+    simple_scramble,
+    unscramble_image,
+)
 
-# ✅ FIX: Redirect ALL prints to stderr EXCEPT final JSON
-def log(message):
-    """Safe logging to stderr"""
-    print(message, file=sys.stderr, flush=True)
+try:
+    import imagecodecs
+    HAVE_IMAGECODECS = True
+except ImportError:
+    # imagecodecs is optional; without it every image is decoded by PIL
+    HAVE_IMAGECODECS = False
 
-def calculate_entropy(data):
-    """Calculate Shannon entropy"""
-    if len(data) == 0:
-        return 0.0
-    flat_data = np.array(data).flatten()
-    hist, _ = np.histogram(flat_data, bins=256, range=(0, 256))
-    hist = hist[hist > 0]
-    hist = hist / hist.sum()
-    entropy = -np.sum(hist * np.log2(hist))
-    return float(entropy)
+# Diagnostics go to stderr, never stdout, which carries only the JSON result.
+# Set STEGO_LOG=DEBUG to see progress messages; at the default WARNING level
+# they are dropped before any formatting happens. An unknown level name falls
+# back to WARNING rather than failing the import.
+logger = logging.getLogger('stego')
+logger.addHandler(logging.StreamHandler(sys.stderr))
+_log_level = os.environ.get('STEGO_LOG', 'WARNING').upper()
+logger.setLevel(_log_level if isinstance(logging.getLevelName(_log_level), int) else logging.WARNING)
+# Our handler already writes these; don't repeat them through a host
+# application's root handlers
+logger.propagate = False
 
-def simple_scramble(image_array):
-    """Simple chaotic scrambling"""
-    flat = image_array.flatten()
-    np.random.seed(42)
-    indices = np.random.permutation(len(flat))
-    scrambled = flat[indices]
-    return scrambled.reshape(image_array.shape), indices
+# Header flag marking a 2-bits-per-channel payload. Legacy headers hold a
+# plain bit count, which never reaches 2^31 for a real cover image.
+LSB_DEPTH2_FLAG = 0x80000000
 
-def simple_unscramble(scrambled_array, indices):
-    """Reverse scrambling"""
-    flat = scrambled_array.flatten()
-    original = np.zeros_like(flat)
-    original[indices] = flat
-    return original.reshape(scrambled_array.shape)
+def _check_lsb_depth(lsb_depth):
+    """Reject depths other than 1 or 2 bits per channel byte"""
+    if lsb_depth not in (1, 2):
+        raise ValueError(f'Unsupported LSB depth: {lsb_depth}')
 
-def embed_lsb_fast(cover_image, secret_data):
-    """FAST LSB embedding using NumPy vectorization"""
+# Plaintext is encrypted and embedded this many bytes at a time, so each
+# ciphertext chunk lands in the cover while it is still in cache
+EMBED_CHUNK = 1 << 18
+
+def _rgb_array(image):
+    """Writable H x W x 3 uint8 pixels of a PIL image, or the array itself"""
+    if not isinstance(image, Image.Image):
+        return image
+    
+    # Convert to RGB
+    if image.mode != 'RGB':
+        image = image.convert('RGB')
+    
+    # The raw RGB bytes are already the layout the kernels want, so skip the
+    # array interface; the bytearray is the one writable copy
+    width, height = image.size
+    return np.frombuffer(bytearray(image.tobytes()), dtype=np.uint8).reshape(height, width, 3)
+
+def load_rgb(path):
+    """
+    Writable H x W x 3 uint8 pixels of the image file at path
+    
+    With imagecodecs installed, decoding goes through its SIMD-accelerated
+    codecs (libspng/libdeflate for PNG) straight into a NumPy array. Images
+    it cannot decode, or that do not come back as 8-bit RGB (grayscale,
+    alpha, 16-bit), are converted by PIL as before.
+    """
+    if HAVE_IMAGECODECS:
+        try:
+            pixels = imagecodecs.imread(path)
+        except Exception:
+            pixels = None
+        if pixels is not None and pixels.dtype == np.uint8 and pixels.ndim == 3 and pixels.shape[2] == 3:
+            return np.ascontiguousarray(pixels)
+    return _rgb_array(Image.open(path))
+
+def _lsb_cover(cover_image, payload_size, lsb_depth):
+    """
+    Flat RGB cover, ready for in-place writes, with the 32-bit length header
+    for a payload_size-byte payload already embedded
+    
+    Args:
+        cover_image: PIL image (copied) or writable array from load_rgb (used in place)
+    
+    Returns:
+        (flat cover array, cover image size)
+    """
+    _check_lsb_depth(lsb_depth)
+    
+    cover_array = _rgb_array(cover_image)
+    flat_cover = cover_array.reshape(-1)
+    size = (cover_array.shape[1], cover_array.shape[0])
+    logger.debug('Cover size: %s', size)
+    
+    # Create length header (32 bits, MSB first)
+    data_length = payload_size * 8
+    header = data_length | (LSB_DEPTH2_FLAG if lsb_depth == 2 else 0)
+    header_bytes = np.array([header], dtype='>u4').view(np.uint8)
+    
+    logger.debug('Total bits to embed: %s', 32 + data_length)
+    
+    # Check capacity
+    capacity = len(flat_cover)
+    needed = 32 + data_length // lsb_depth
+    
+    if needed > capacity:
+        raise ValueError(f'Cover too small: need {needed} bytes, have {capacity}')
+    
+    logger.debug('Flattened cover size: %s', len(flat_cover))
+    
+    embed_lsb(flat_cover, header_bytes, 0)
+    return flat_cover, size
+
+def embed_lsb_fast(cover_image, secret_data, lsb_depth=1):
+    """
+    FAST LSB embedding using NumPy vectorization
+    
+    The 32-bit length header always uses 1 LSB per channel byte; the payload
+    uses lsb_depth (1 or 2) LSBs per channel byte. Depth 2 halves the cover
+    bytes touched at the cost of a lower PSNR.
+    """
     try:
-        # Convert to RGB
-        if cover_image.mode != 'RGB':
-            cover_image = cover_image.convert('RGB')
+        # Payload stays as bytes; the embed kernel pulls the bits out itself
+        data_bytes = np.frombuffer(secret_data, dtype=np.uint8)
+        flat_cover, size = _lsb_cover(cover_image, data_bytes.size, lsb_depth)
         
-        cover_array = np.array(cover_image, dtype=np.uint8)
-        log(f'Cover array shape: {cover_array.shape}')
+        # FAST EMBEDDING
+        logger.debug('Embedding %s bits at depth %s...', data_bytes.size * 8, lsb_depth)
+        embed_lsb(flat_cover, data_bytes, 32, lsb_depth)
         
-        # Convert data to bit array
-        data_bits = np.unpackbits(np.frombuffer(secret_data, dtype=np.uint8))
-        data_length = len(data_bits)
+        logger.debug('Embedding complete, building image...')
         
-        # Create length header (32 bits)
-        length_bits = np.array([int(b) for b in format(data_length, '032b')], dtype=np.uint8)
+        # Create image straight from the raw RGB bytes
+        stego_image = Image.frombytes('RGB', size, flat_cover)
         
-        # Combine header + data
-        all_bits = np.concatenate([length_bits, data_bits])
+        logger.debug('Stego image created successfully')
         
-        log(f'Total bits to embed: {len(all_bits)}')
+        return stego_image
         
-        # Check capacity
-        flat_cover = cover_array.flatten()
-        capacity = len(flat_cover)
+    except Exception as e:
+        logger.error('LSB embedding error: %s', e)
+        raise
+
+def embed_encrypted_fast(cover_image, prefix, plain_data, encryptor, lsb_depth=1):
+    """
+    Encrypt plain_data and embed prefix + GCM tag + ciphertext into the cover
+    
+    Fuses encryption with embed_lsb_fast: each EMBED_CHUNK of ciphertext is
+    written into the cover LSBs straight after it is produced, so the whole
+    ciphertext is never held in memory. The tag, only known once the last
+    chunk is done, goes into the 16 payload bytes reserved after the prefix.
+    
+    Returns:
+        (stego image, entropy of the ciphertext)
+    """
+    try:
+        per_byte = 8 // lsb_depth
+        data_start = len(prefix) + 16
+        flat_cover, size = _lsb_cover(cover_image, data_start + plain_data.size, lsb_depth)
+        embed_lsb(flat_cover, np.frombuffer(prefix, dtype=np.uint8), 32, lsb_depth)
         
-        if len(all_bits) > capacity:
-            raise ValueError(f'Cover too small: need {len(all_bits)} bits, have {capacity}')
+        logger.debug('Encrypting and embedding %s bytes at depth %s...', plain_data.size, lsb_depth)
         
-        log(f'Flattened cover size: {len(flat_cover)}')
+        # update_into needs one block of slack past the chunk
+        chunk = np.empty(EMBED_CHUNK + 15, dtype=np.uint8)
+        offset = data_start
         
-        # FAST EMBEDDING
-        log(f'Embedding {len(all_bits)} bits...')
-        flat_cover[:len(all_bits)] = (flat_cover[:len(all_bits)] & 0xFE) | all_bits
+        # Below ENTROPY_ESTIMATE_MIN the ciphertext entropy is measured,
+        # counting each chunk's bytes while it is in cache
+        counts = np.zeros(256, dtype=np.int64) if plain_data.size < ENTROPY_ESTIMATE_MIN else None
+        for start in range(0, plain_data.size, EMBED_CHUNK):
+            n = encryptor.update_into(plain_data[start:start + EMBED_CHUNK], chunk)
+            if counts is not None:
+                counts += np.bincount(chunk[:n], minlength=256)
+            embed_lsb(flat_cover, chunk[:n], 32 + offset * per_byte, lsb_depth)
+            offset += n
+        encryptor.finalize()
         
-        log('Embedding complete, reshaping...')
+        tag = np.frombuffer(encryptor.tag, dtype=np.uint8)
+        embed_lsb(flat_cover, tag, 32 + len(prefix) * per_byte, lsb_depth)
+        encrypted_entropy = 8.0 if counts is None else entropy_from_counts(counts)
         
-        # Reshape and create image
-        stego_array = flat_cover.reshape(cover_array.shape)
-        stego_image = Image.fromarray(stego_array, mode='RGB')
+        logger.debug('Embedding complete, building image...')
         
-        log('Stego image created successfully')
+        stego_image = Image.frombytes('RGB', size, flat_cover)
         
-        return stego_image
+        logger.debug('Stego image created successfully')
+        
+        return stego_image, encrypted_entropy
         
     except Exception as e:
-        log(f'LSB embedding error: {str(e)}')
+        logger.error('LSB embedding error: %s', e)
         raise
 
 def extract_lsb_fast(stego_image):
-    """FAST LSB extraction using NumPy"""
+    """FAST LSB extraction from a PIL image or an array from load_rgb"""
     try:
-        if stego_image.mode != 'RGB':
-            stego_image = stego_image.convert('RGB')
-        
-        stego_array = np.array(stego_image, dtype=np.uint8).flatten()
+        if isinstance(stego_image, Image.Image):
+            if stego_image.mode != 'RGB':
+                stego_image = stego_image.convert('RGB')
+            stego_array = np.frombuffer(stego_image.tobytes(), dtype=np.uint8)
+        else:
+            stego_array = stego_image.reshape(-1)
         
-        log(f'Extracting from {len(stego_array)} pixels')
+        logger.debug('Extracting from %s pixels', len(stego_array))
         
-        # Extract length (first 32 bits)
-        length_bits = stego_array[:32] & 1
-        data_length = int(''.join(str(b) for b in length_bits), 2)
+        # Extract length (first 32 bits, read back as 4 big-endian bytes)
+        header = int(extract_lsb(stego_array, 0, 4).view('>u4')[0])
+        lsb_depth = 2 if header & LSB_DEPTH2_FLAG else 1
+        data_length = header & ~LSB_DEPTH2_FLAG
+        byte_count = -(-data_length // 8)
         
-        log(f'Data length: {data_length} bits')
+        logger.debug('Data length: %s bits, depth %s', data_length, lsb_depth)
         
-        if data_length <= 0 or data_length > len(stego_array) - 32:
+        if data_length <= 0 or byte_count * 8 // lsb_depth > len(stego_array) - 32:
             raise ValueError(f'Invalid data length: {data_length}')
         
-        # Extract data bits
-        data_bits = stego_array[32:32+data_length] & 1
-        
-        log(f'Extracted {len(data_bits)} bits, converting to bytes...')
+        # Extract data bytes directly; the kernel packs the bits as it reads them
+        data_bytes = extract_lsb(stego_array, 32, byte_count, lsb_depth)
         
-        # Convert bits to bytes
-        remainder = len(data_bits) % 8
+        # Zero the padding bits of a partial final byte
+        remainder = data_length % 8
         if remainder != 0:
-            data_bits = np.concatenate([data_bits, np.zeros(8 - remainder, dtype=np.uint8)])
+            data_bytes[-1] &= 0xFF << (8 - remainder) & 0xFF
         
-        secret_bytes = np.packbits(data_bits).tobytes()
+        secret_bytes = data_bytes.tobytes()
         
-        log(f'Converted to {len(secret_bytes)} bytes')
+        logger.debug('Converted to %s bytes', len(secret_bytes))
         
         return secret_bytes
         
     except Exception as e:
-        log(f'LSB extraction error: {str(e)}')
+        logger.error('LSB extraction error: %s', e)
         raise
 
-def encrypt_with_steganography(secret_path, cover_path, key, chaotic_map='logistic'):
+def encrypt_with_steganography(secret_path, cover_path, key, chaotic_map='logistic', lsb_depth=1):
     """Triple-layer encryption with FAST embedding"""
     try:
-        log('Starting steganography encryption...')
+        # Checked up front so a bad depth is not reported as a capacity error
+        _check_lsb_depth(lsb_depth)
+        logger.debug('Starting steganography encryption...')
         
         # Load secret
         secret_img = Image.open(secret_path)
-        log(f'Secret image loaded: {secret_img.size}, mode: {secret_img.mode}')
+        logger.debug('Secret image loaded: %s, mode: %s', secret_img.size, secret_img.mode)
         
         if secret_img.mode not in ['RGB', 'L']:
             secret_img = secret_img.convert('RGB')
         
-        secret_array = np.array(secret_img)
-        original_entropy = calculate_entropy(secret_array)
+        secret_array = np.asarray(secret_img)
+        original_entropy = calculate_entropy(secret_img)
         
-        # Metadata
+        # Metadata (the scramble seed is not secret; AES provides confidentiality)
+        scramble_seed = int.from_bytes(os.urandom(8), byteorder='big')
         metadata = {
             'mode': secret_img.mode,
             'shape': list(secret_array.shape),
-            'dtype': str(secret_array.dtype)
+            'dtype': str(secret_array.dtype),
+            'cipher': CIPHER_NAME,
+            'aad': AAD_METADATA,
+            'kdf': KDF_NAME,
+            'scramble': SCRAMBLE_NAME,
+            'scramble_seed': scramble_seed
         }
         
-        log(f'Secret image: {secret_array.shape}, mode: {secret_img.mode}')
+        logger.debug('Secret image: %s, mode: %s', secret_array.shape, secret_img.mode)
         
         # Scramble
-        scrambled, _ = simple_scramble(secret_array)
-        secret_bytes = scrambled.tobytes()
-        log(f'Scrambled size: {len(secret_bytes)} bytes')
+        scrambled = simple_scramble(secret_array, scramble_seed)
+        plain_data = scrambled.reshape(-1).view(np.uint8)
+        logger.debug('Scrambled size: %s bytes', plain_data.size)
         
         # Metadata
         metadata_json = json.dumps(metadata).encode('utf-8')
         metadata_length = len(metadata_json)
         
-        # Encrypt
-        key_bytes = key.encode('utf-8')[:32].ljust(32, b'\0')
-        cipher = AES.new(key_bytes, AES.MODE_CBC)
-        iv = cipher.iv
-        
-        padded_data = pad(secret_bytes, AES.block_size)
-        encrypted_data = cipher.encrypt(padded_data)
-        
-        log(f'Encrypted size: {len(encrypted_data)} bytes')
+        # Encrypt (GCM: independent counter blocks, no padding; the tag covers the
+        # metadata as associated data and catches a wrong key or tampering)
+        key_bytes = derive_key(key)
+        nonce = os.urandom(12)
+        encryptor = Cipher(algorithms.AES(key_bytes), modes.GCM(nonce)).encryptor()
+        encryptor.authenticate_additional_data(metadata_json)
         
-        encrypted_entropy = calculate_entropy(np.frombuffer(encrypted_data, dtype=np.uint8))
-        
-        # Combine
-        full_data = (
-            metadata_length.to_bytes(4, byteorder='big') +
-            metadata_json +
-            iv +
-            encrypted_data
-        )
+        # Payload: metadata_length(4) + metadata + nonce(12) + tag(16) + encrypted
+        # (GCM ciphertext is exactly as long as the plaintext)
+        prefix = metadata_length.to_bytes(4, byteorder='big') + metadata_json + nonce
+        payload_size = len(prefix) + 16 + plain_data.size
         
-        log(f'Total data to embed: {len(full_data)} bytes')
+        logger.debug('Total data to embed: %s bytes', payload_size)
         
         # Load cover
-        cover_img = Image.open(cover_path)
-        log(f'Cover image loaded: {cover_img.size}, mode: {cover_img.mode}')
+        cover_array = load_rgb(cover_path)
+        logger.debug('Cover image loaded: %s', cover_array.shape)
         
-        if cover_img.mode != 'RGB':
-            cover_img = cover_img.convert('RGB')
+        # Check capacity (header always uses 1 bit per channel byte)
+        cover_size = 32 + (cover_array.size - 32) * lsb_depth
+        required_bits = payload_size * 8 + 32
         
-        # Check capacity
-        cover_size = cover_img.size[0] * cover_img.size[1] * 3
-        required_bits = len(full_data) * 8 + 32
-        
-        log(f'Cover capacity: {cover_size} bits, Required: {required_bits} bits')
+        logger.debug('Cover capacity: %s bits, Required: %s bits', cover_size, required_bits)
         
         if required_bits > cover_size:
             return {
@@ -201,9 +318,11 @@ def encrypt_with_steganography(secret_path, cover_path, key, chaotic_map='logist
                 'error': f'Cover too small: need {required_bits} bits, have {cover_size} bits'
             }
         
-        # FAST EMBED
-        log('Starting FAST LSB embedding...')
-        stego_img = embed_lsb_fast(cover_img, full_data)
+        # FAST ENCRYPT + EMBED
+        logger.debug('Starting FAST LSB embedding...')
+        stego_img, encrypted_entropy = embed_encrypted_fast(
+            cover_array, prefix, plain_data, encryptor, lsb_depth
+        )
         
         # Save
         output_dir = os.path.dirname(cover_path)
@@ -216,10 +335,10 @@ def encrypt_with_steganography(secret_path, cover_path, key, chaotic_map='logist
         base_name = os.path.splitext(os.path.basename(cover_path))[0]
         stego_path = os.path.join(output_dir, f"{base_name}_stego.png")
         
-        log(f'Saving stego image to: {stego_path}')
-        stego_img.save(stego_path, 'PNG')
+        logger.debug('Saving stego image to: %s', stego_path)
+        stego_img.save(stego_path, 'PNG', compress_level=PNG_COMPRESS_LEVEL)
         
-        log(f'✅ Stego image saved successfully')
+        logger.debug('Stego image saved successfully')
         
         # ✅ Return JSON result
         return {
@@ -236,50 +355,93 @@ def encrypt_with_steganography(secret_path, cover_path, key, chaotic_map='logist
         }
         
     except Exception as e:
-        log(f'❌ Encryption failed: {str(e)}')
-        import traceback
-        traceback.print_exc(file=sys.stderr)
+        logger.exception('Encryption failed: %s', e)
         return {
             'success': False,
             'error': str(e)
         }
 
+def encrypt_batch(pairs, key, chaotic_map='logistic', lsb_depth=1, max_workers=None):
+    """
+    Run encrypt_with_steganography over (secret_path, cover_path) pairs in parallel
+    
+    Each job runs in its own process, so decoding, scrambling, AES and
+    embedding scale across cores. Workers are spawned rather than forked,
+    since forking a process whose Numba thread pool is already running is
+    unsafe (as in the persistent worker). The cores are split between the
+    workers, so N processes don't each start N kernel threads.
+    
+    Returns:
+        {'success': True, 'results': [one result per pair, in order]}
+    """
+    # Imported here so single-image CLI calls don't pay for the pool machinery
+    import multiprocessing
+    from concurrent.futures import ProcessPoolExecutor
+    
+    try:
+        _check_lsb_depth(lsb_depth)
+        cores = os.cpu_count() or 1
+        workers = max(1, min(max_workers or cores, len(pairs)))
+        context = multiprocessing.get_context('spawn')
+        with ProcessPoolExecutor(max_workers=workers, mp_context=context,
+                                 initializer=set_num_threads, initargs=(cores // workers,)) as pool:
+            futures = [
+                pool.submit(encrypt_with_steganography, secret_path, cover_path, key, chaotic_map, lsb_depth)
+                for secret_path, cover_path in pairs
+            ]
+            results = [future.result() for future in futures]
+        
+        return {'success': True, 'results': results}
+        
+    except Exception as e:
+        logger.exception('Batch encryption failed: %s', e)
+        return {'success': False, 'error': str(e)}
+
 def decrypt_from_steganography(stego_path, key):
     """Triple-layer decryption with FAST extraction"""
     try:
-        log('Starting steganography decryption...')
+        logger.debug('Starting steganography decryption...')
         
         # Load stego
-        stego_img = Image.open(stego_path)
-        log(f'Stego image loaded: {stego_img.size}')
+        stego_array = load_rgb(stego_path)
+        logger.debug('Stego image loaded: %s', stego_array.shape)
         
         # FAST EXTRACT
-        extracted_data = extract_lsb_fast(stego_img)
-        log(f'Extracted {len(extracted_data)} bytes')
+        extracted_data = extract_lsb_fast(stego_array)
+        logger.debug('Extracted %s bytes', len(extracted_data))
         
         # Parse metadata
         metadata_length = int.from_bytes(extracted_data[:4], byteorder='big')
-        log(f'Metadata length: {metadata_length}')
+        logger.debug('Metadata length: %s', metadata_length)
         
         metadata_json = extracted_data[4:4+metadata_length]
         metadata = json.loads(metadata_json.decode('utf-8'))
-        log(f'Metadata: {metadata}')
+        logger.debug('Metadata: %s', metadata)
         
-        # Get IV and encrypted
+        # Get nonce and tag (GCM) or IV (legacy CBC), then encrypted
         iv_start = 4 + metadata_length
-        iv = extracted_data[iv_start:iv_start+16]
-        encrypted_data = extracted_data[iv_start+16:]
+        if metadata.get('cipher') == CIPHER_NAME:
+            mode = modes.GCM(extracted_data[iv_start:iv_start+12], extracted_data[iv_start+12:iv_start+28])
+            encrypted_data = extracted_data[iv_start+28:]
+        else:
+            mode = modes.CBC(extracted_data[iv_start:iv_start+16])
+            encrypted_data = extracted_data[iv_start+16:]
         
-        log(f'Encrypted data size: {len(encrypted_data)} bytes')
+        logger.debug('Encrypted data size: %s bytes', len(encrypted_data))
         
         # Decrypt
-        key_bytes = key.encode('utf-8')[:32].ljust(32, b'\0')
-        cipher = AES.new(key_bytes, AES.MODE_CBC, iv=iv)
+        key_bytes = derive_key(key, metadata.get('kdf'))
+        decryptor = Cipher(algorithms.AES(key_bytes), mode).decryptor()
+        if metadata.get('aad') == AAD_METADATA:
+            decryptor.authenticate_additional_data(metadata_json)
         
         try:
-            decrypted_data = unpad(cipher.decrypt(encrypted_data), AES.block_size)
-            log(f'Decrypted data size: {len(decrypted_data)} bytes')
-        except:
+            decrypted_data = decryptor.update(encrypted_data) + decryptor.finalize()
+            if isinstance(mode, modes.CBC):
+                unpadder = PKCS7(128).unpadder()
+                decrypted_data = unpadder.update(decrypted_data) + unpadder.finalize()
+            logger.debug('Decrypted data size: %s bytes', len(decrypted_data))
+        except (ValueError, InvalidTag):
             return {'success': False, 'error': 'Invalid key or corrupted data'}
         
         # Reconstruct
@@ -287,10 +449,8 @@ def decrypt_from_steganography(stego_path, key):
         dtype = np.dtype(metadata['dtype'])
         img_array = np.frombuffer(decrypted_data, dtype=dtype).reshape(shape)
         
-        # Unscramble
-        np.random.seed(42)
-        indices = np.random.permutation(img_array.size)
-        img_array = simple_unscramble(img_array, indices)
+        # Unscramble (as named by the metadata, or the legacy permutation)
+        img_array = unscramble_image(img_array, metadata)
         
         # Save
         img = Image.fromarray(img_array.astype(np.uint8), mode=metadata['mode'])
@@ -301,9 +461,9 @@ def decrypt_from_steganography(stego_path, key):
         os.makedirs(output_dir, exist_ok=True)
         
         output_path = os.path.join(output_dir, f"extracted_{os.path.basename(stego_path)}")
-        img.save(output_path)
+        img.save(output_path, compress_level=PNG_COMPRESS_LEVEL)
         
-        log(f'✅ Extracted image saved: {output_path}')
+        logger.debug('Extracted image saved: %s', output_path)
         
         return {
             'success': True,
@@ -312,33 +472,52 @@ def decrypt_from_steganography(stego_path, key):
         }
         
     except Exception as e:
-        log(f'❌ Decryption failed: {str(e)}')
-        import traceback
-        traceback.print_exc(file=sys.stderr)
+        logger.exception('Decryption failed: %s', e)
         return {'success': False, 'error': str(e)}
 
+def run_command(argv):
+    """
+    Run one command given as its CLI arguments, e.g. ['decrypt', stego_path, key]
+    
+    Shared by main() and worker.py so both convert arguments the same way;
+    values the worker has already decoded from JSON (an int depth, a list
+    of pairs) are accepted as they are.
+    """
+    if len(argv) < 1:
+        return {'success': False, 'error': 'No command specified'}
+    
+    command, args = argv[0], argv[1:]
+    if command == 'encrypt' and len(args) >= 3:
+        return encrypt_with_steganography(
+            args[0],
+            args[1],
+            args[2],
+            args[3] if len(args) > 3 else 'logistic',
+            int(args[4]) if len(args) > 4 else 1
+        )
+    if command == 'encrypt-batch' and len(args) >= 2:
+        # Jobs as a JSON list of [secret_path, cover_path] pairs
+        pairs = json.loads(args[0]) if isinstance(args[0], str) else args[0]
+        return encrypt_batch(
+            pairs,
+            args[1],
+            args[2] if len(args) > 2 else 'logistic',
+            int(args[3]) if len(args) > 3 else 1
+        )
+    if command == 'decrypt' and len(args) >= 2:
+        return decrypt_from_steganography(args[0], args[1])
+    return {'success': False, 'error': 'Invalid command or arguments'}
+
 def main():
     """Main entry point - prints ONLY JSON to stdout"""
     try:
-        if len(sys.argv) < 2:
-            result = {'success': False, 'error': 'No command specified'}
-        elif sys.argv[1] == 'encrypt' and len(sys.argv) >= 5:
-            result = encrypt_with_steganography(
-                sys.argv[2], 
-                sys.argv[3], 
-                sys.argv[4],
-                sys.argv[5] if len(sys.argv) > 5 else 'logistic'
-            )
-        elif sys.argv[1] == 'decrypt' and len(sys.argv) >= 4:
-            result = decrypt_from_steganography(sys.argv[2], sys.argv[3])
-        else:
-            result = {'success': False, 'error': 'Invalid command or arguments'}
+        result = run_command(sys.argv[1:])
         
         # ✅ CRITICAL: Print ONLY JSON to stdout (no extra text!)
         print(json.dumps(result), flush=True)
         
     except Exception as e:
-        log(f'Fatal error in main: {str(e)}')
+        logger.error('Fatal error in main: %s', e)
         error_result = {'success': False, 'error': str(e)}
         print(json.dumps(error_result), flush=True)
         sys.exit(1)
@@ -0,0 +1,51 @@
+# python/tests/support.py - shared setup for the tests; import it before any
+# of the scripts under test
+#
+# Run from the repo root:
+#     python -m unittest discover -s python/tests
+# and again with the optional accelerators blocked, so the fallback paths
+# are covered too:
+#     HYBRID_ENC_BLOCK=numba,imagecodecs python -m unittest discover -s python/tests
+import os
+import sys
+import json
+import shutil
+import tempfile
+import unittest
+import numpy as np
+from PIL import Image
+
+# Optional modules to hide, so their imports raise ImportError
+for _name in filter(None, os.environ.get('HYBRID_ENC_BLOCK', '').split(',')):
+    sys.modules[_name.strip()] = None
+
+# The scripts import each other by bare module name
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+def random_pixels(shape, seed=0):
+    """Deterministic random uint8 pixels"""
+    return np.random.default_rng(seed).integers(0, 256, shape, dtype=np.uint8)
+
+def read_pixels(path):
+    """Pixels of the image file at path"""
+    with Image.open(path) as img:
+        return np.array(img)
+
+class TempDirTestCase(unittest.TestCase):
+    """Test case with a fresh directory in self.dir"""
+
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.dir, ignore_errors=True)
+
+    def save_image(self, name, pixels):
+        """Save pixels as a PNG in self.dir and return its path"""
+        path = os.path.join(self.dir, name)
+        Image.fromarray(pixels).save(path)
+        return path
+
+def split_payload(data):
+    """(metadata dict, metadata JSON bytes, rest) of a .bin file or stego payload"""
+    length = int.from_bytes(data[:4], byteorder='big')
+    metadata_json = bytes(data[4:4 + length])
+    return json.loads(metadata_json), metadata_json, bytes(data[4 + length:])
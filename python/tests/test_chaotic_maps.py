@@ -0,0 +1,127 @@
+import io
+import os
+import unittest
+from unittest import mock
+from pathlib import Path
+import numpy as np
+from support import TempDirTestCase, random_pixels
+import chaotic_maps
+
+MAPS = ('logistic', 'tent', 'henon', 'arnold')
+
+class CacheDirTestCase(TempDirTestCase):
+    """Test case with chaotic_maps caching into self.dir"""
+
+    def setUp(self):
+        super().setUp()
+        saved = chaotic_maps.CACHE_DIR
+        chaotic_maps.CACHE_DIR = Path(self.dir)
+        self.addCleanup(setattr, chaotic_maps, 'CACHE_DIR', saved)
+
+class IndexGeneratorTest(unittest.TestCase):
+    def test_match_map_functions(self):
+        # The compiled generators iterate the same maps as the reference functions
+        n = 997
+        x, expected = 0.5, []
+        for _ in range(n):
+            x = chaotic_maps.logistic_map(x)
+            expected.append(int(x * n) % n)
+        self.assertEqual(chaotic_maps._logistic_indices(n).tolist(), expected)
+
+        x, expected = 0.5, []
+        for _ in range(n):
+            x = chaotic_maps.tent_map(x)
+            expected.append(int(x * n) % n)
+        self.assertEqual(chaotic_maps._tent_indices(n).tolist(), expected)
+
+        x, y, expected = 0.5, 0.5, []
+        for _ in range(n):
+            x, y = chaotic_maps.henon_map(x, y)
+            expected.append(int(abs(x) * n) % n)
+        self.assertEqual(chaotic_maps._henon_indices(n).tolist(), expected)
+
+    def test_arnold(self):
+        height, width, channels = 7, 9, 3
+        expected = []
+        for i in range(height):
+            for j in range(width):
+                x, y = i / height, j / width
+                for _ in range(5):
+                    x, y = chaotic_maps.arnold_cat_map(x, y)
+                pixel = (int(x * height) % height) * width + int(y * width) % width
+                expected.extend(pixel * channels + c for c in range(channels))
+        self.assertEqual(chaotic_maps._arnold_indices(height, width, channels, 5).tolist(), expected)
+
+class ScrambleTest(CacheDirTestCase):
+    def test_round_trip(self):
+        # The second pass loads each permutation from the cache
+        for shape in ((31, 43, 3), (29, 17)):
+            pixels = random_pixels(shape)
+            for map_type in MAPS + ('unknown',):
+                for _ in range(2):
+                    scrambled = chaotic_maps.apply_chaotic_scramble(pixels, map_type)
+                    np.testing.assert_array_equal(np.sort(scrambled, axis=None), np.sort(pixels, axis=None))
+                    restored = chaotic_maps.reverse_chaotic_scramble(scrambled, map_type)
+                    np.testing.assert_array_equal(restored, pixels)
+
+    def test_permutation(self):
+        for map_type in MAPS:
+            indices = chaotic_maps._chaotic_indices((13, 11, 3), map_type, 5)
+            np.testing.assert_array_equal(np.sort(indices), np.arange(13 * 11 * 3))
+
+    def test_scrambles(self):
+        pixels = random_pixels((20, 30, 3))
+        for map_type in ('logistic', 'henon', 'arnold'):
+            self.assertFalse(np.array_equal(chaotic_maps.apply_chaotic_scramble(pixels, map_type), pixels))
+
+class CacheTest(CacheDirTestCase):
+    def generator_calls(self, shape, map_type='logistic'):
+        """Times _chaotic_indices had to generate the sequence for shape"""
+        generate = mock.Mock(wraps=chaotic_maps._DISPATCH[map_type])
+        with mock.patch.dict(chaotic_maps._DISPATCH, {map_type: generate}):
+            chaotic_maps._chaotic_indices(shape, map_type, 5)
+        return generate.call_count
+
+    def test_hit(self):
+        self.assertEqual(self.generator_calls((10, 12, 3)), 1)
+        self.assertEqual(self.generator_calls((10, 12, 3)), 0)
+        self.assertEqual(self.generator_calls((10, 13, 3)), 1)
+
+    def test_hit_without_utime(self):
+        self.generator_calls((10, 12, 3))
+        with mock.patch('os.utime', side_effect=PermissionError):
+            self.assertEqual(self.generator_calls((10, 12, 3)), 0)
+
+    def test_lru_eviction(self):
+        def cached(n):
+            return chaotic_maps.CACHE_DIR / f'perm_logistic_{n}.npy'
+
+        def npy_size(n):
+            buf = io.BytesIO()
+            np.save(buf, np.empty(n, dtype=np.intp))
+            return buf.tell()
+
+        limit = npy_size(360) + npy_size(420) + npy_size(450)
+        with mock.patch.object(chaotic_maps, 'CACHE_MAX_BYTES', limit):
+            for width in (12, 13, 14):
+                chaotic_maps._chaotic_indices((10, width, 3), 'logistic', 5)
+            # Width 12 was used most recently, width 13 least
+            os.utime(cached(360), (3e9, 3e9))
+            os.utime(cached(390), (1e9, 1e9))
+            os.utime(cached(420), (2e9, 2e9))
+            chaotic_maps._chaotic_indices((10, 15, 3), 'logistic', 5)
+        self.assertEqual(sorted(p.name for p in Path(self.dir).iterdir()),
+                         [cached(n).name for n in (360, 420, 450)])
+
+    def test_failed_write_leaves_no_temp_file(self):
+        def partial_save(path, array):
+            Path(path).write_bytes(b'partial')
+            raise OSError('disk full')
+
+        with mock.patch('numpy.save', side_effect=partial_save):
+            indices = chaotic_maps._chaotic_indices((10, 12, 3), 'logistic', 5)
+        self.assertEqual(indices.size, 360)
+        self.assertEqual(list(Path(self.dir).iterdir()), [])
+
+if __name__ == '__main__':
+    unittest.main()
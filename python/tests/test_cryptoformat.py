@@ -0,0 +1,90 @@
+import hashlib
+import unittest
+import numpy as np
+from PIL import Image
+from support import random_pixels
+from cryptoformat import (
+    ENTROPY_ESTIMATE_MIN,
+    KDF_NAME,
+    calculate_entropy,
+    ciphertext_entropy,
+    derive_key,
+    simple_scramble,
+    simple_unscramble,
+    unscramble_image,
+)
+from kernels import fisher_yates
+
+class DeriveKeyTest(unittest.TestCase):
+    def test_sha256(self):
+        self.assertEqual(derive_key('k3y'), hashlib.sha256(b'k3y').digest())
+        self.assertEqual(derive_key('k3y', KDF_NAME), derive_key('k3y'))
+
+    def test_legacy_zero_padded(self):
+        self.assertEqual(derive_key('k3y', None), b'k3y' + b'\0' * 29)
+
+    def test_legacy_truncated(self):
+        key = 'x' * 40
+        self.assertEqual(derive_key(key, None), b'x' * 32)
+
+class ScrambleTest(unittest.TestCase):
+    def test_fixed_order(self):
+        # The order is part of the file format: files written today must
+        # unscramble with every later NumPy and with or without Numba
+        a = np.arange(12)
+        fisher_yates(a, 1234)
+        self.assertEqual(a.tolist(), [5, 0, 4, 7, 11, 3, 10, 6, 1, 8, 2, 9])
+
+    def test_block_size_does_not_change_order(self):
+        a = np.arange(3000)
+        b = np.arange(3000)
+        fisher_yates(a, 7, block=100)
+        fisher_yates(b, 7)
+        np.testing.assert_array_equal(a, b)
+
+    def test_round_trip(self):
+        for shape in ((37, 53, 3), (41, 29)):
+            pixels = random_pixels(shape)
+            scrambled = simple_scramble(pixels, 99)
+            self.assertEqual(scrambled.shape, pixels.shape)
+            self.assertFalse(np.array_equal(scrambled, pixels))
+            np.testing.assert_array_equal(simple_unscramble(scrambled, 99), pixels)
+
+    def test_wrong_seed(self):
+        pixels = random_pixels((20, 20, 3))
+        scrambled = simple_scramble(pixels, 1)
+        self.assertFalse(np.array_equal(simple_unscramble(scrambled, 2), pixels))
+
+    def test_legacy_permutation(self):
+        pixels = random_pixels((16, 24, 3))
+        flat = pixels.reshape(-1)
+        scrambled = flat[np.random.RandomState(42).permutation(flat.size)].reshape(pixels.shape)
+        np.testing.assert_array_equal(unscramble_image(scrambled, {}), pixels)
+
+    def test_unsupported_scramble(self):
+        with self.assertRaises(ValueError):
+            unscramble_image(random_pixels((4, 4)), {'scramble_seed': 1})
+
+class EntropyTest(unittest.TestCase):
+    def test_constant_and_uniform(self):
+        self.assertEqual(calculate_entropy(np.zeros(100, dtype=np.uint8)), 0.0)
+        self.assertEqual(calculate_entropy(np.arange(256, dtype=np.uint8)), 8.0)
+
+    def test_pil_histogram_matches_array(self):
+        # Byte-mode images are counted by PIL; the result must not change
+        for shape, mode in (((30, 40, 3), 'RGB'), ((30, 40), 'L'), ((30, 40, 4), 'RGBA')):
+            pixels = random_pixels(shape)
+            img = Image.fromarray(pixels, mode=mode)
+            self.assertAlmostEqual(calculate_entropy(img), calculate_entropy(pixels), places=12)
+
+    def test_pil_non_byte_mode(self):
+        pixels = random_pixels((10, 12)).astype(np.int32)
+        img = Image.fromarray(pixels, mode='I')
+        self.assertAlmostEqual(calculate_entropy(img), calculate_entropy(pixels), places=12)
+
+    def test_ciphertext_estimate(self):
+        self.assertEqual(ciphertext_entropy(bytes(ENTROPY_ESTIMATE_MIN)), 8.0)
+        self.assertEqual(ciphertext_entropy(bytes(16)), 0.0)
+
+if __name__ == '__main__':
+    unittest.main()
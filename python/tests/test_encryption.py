@@ -0,0 +1,87 @@
+import json
+import os
+import unittest
+import numpy as np
+from cryptography.hazmat.primitives.ciphers import Cipher, algorithms, modes
+from support import TempDirTestCase, random_pixels, read_pixels, split_payload
+from cryptoformat import AAD_METADATA, CIPHER_NAME, KDF_NAME, SCRAMBLE_NAME, derive_key, simple_scramble
+import encryption
+
+class EncryptionRoundTripTest(TempDirTestCase):
+    def round_trip(self, pixels, key='k3y'):
+        path = self.save_image('secret.png', pixels)
+        result = encryption.encrypt_image(path, key)
+        self.assertTrue(result['success'], result.get('error'))
+        return result['encrypted_path']
+
+    def test_rgb(self):
+        pixels = random_pixels((33, 47, 3))
+        encrypted_path = self.round_trip(pixels)
+
+        result = encryption.decrypt_image(encrypted_path, 'k3y')
+        self.assertTrue(result['success'], result.get('error'))
+        np.testing.assert_array_equal(read_pixels(result['decrypted_path']), pixels)
+
+    def test_grayscale(self):
+        pixels = random_pixels((21, 19))
+        result = encryption.decrypt_image(self.round_trip(pixels), 'k3y')
+        self.assertTrue(result['success'], result.get('error'))
+        np.testing.assert_array_equal(read_pixels(result['decrypted_path']), pixels)
+
+    def test_metadata(self):
+        with open(self.round_trip(random_pixels((8, 8, 3))), 'rb') as f:
+            metadata, _, _ = split_payload(f.read())
+        self.assertEqual(metadata['cipher'], CIPHER_NAME)
+        self.assertEqual(metadata['aad'], AAD_METADATA)
+        self.assertEqual(metadata['kdf'], KDF_NAME)
+        self.assertEqual(metadata['scramble'], SCRAMBLE_NAME)
+
+    def test_wrong_key(self):
+        result = encryption.decrypt_image(self.round_trip(random_pixels((8, 8, 3))), 'other')
+        self.assertFalse(result['success'])
+
+    def test_tampered_metadata(self):
+        encrypted_path = self.round_trip(random_pixels((8, 8, 3)))
+        with open(encrypted_path, 'rb') as f:
+            data = f.read()
+        metadata, metadata_json, rest = split_payload(data)
+
+        # Same length, so only the associated data check can notice
+        seed = str(metadata['scramble_seed'])
+        forged = seed[:-1] + str((int(seed[-1]) + 1) % 10)
+        tampered = metadata_json.replace(seed.encode(), forged.encode())
+        with open(encrypted_path, 'wb') as f:
+            f.write(data[:4] + tampered + rest)
+
+        result = encryption.decrypt_image(encrypted_path, 'k3y')
+        self.assertFalse(result['success'])
+        self.assertEqual(result['error'], 'Invalid key or corrupted file')
+
+    def test_gcm_without_aad(self):
+        # GCM files written before the metadata became associated data
+        pixels = random_pixels((12, 10, 3))
+        metadata = {
+            'mode': 'RGB',
+            'shape': list(pixels.shape),
+            'dtype': 'uint8',
+            'cipher': CIPHER_NAME,
+            'kdf': KDF_NAME,
+            'scramble': SCRAMBLE_NAME,
+            'scramble_seed': 5
+        }
+        nonce = os.urandom(12)
+        encryptor = Cipher(algorithms.AES(derive_key('k3y')), modes.GCM(nonce)).encryptor()
+        ciphertext = encryptor.update(simple_scramble(pixels, 5).tobytes()) + encryptor.finalize()
+        metadata_json = json.dumps(metadata).encode('utf-8')
+
+        path = os.path.join(self.dir, 'old.bin')
+        with open(path, 'wb') as f:
+            f.write(len(metadata_json).to_bytes(4, byteorder='big') + metadata_json)
+            f.write(nonce + encryptor.tag + ciphertext)
+
+        result = encryption.decrypt_image(path, 'k3y')
+        self.assertTrue(result['success'], result.get('error'))
+        np.testing.assert_array_equal(read_pixels(result['decrypted_path']), pixels)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,62 @@
+import unittest
+import numpy as np
+from support import random_pixels
+from kernels import diff_stats, pearson
+
+class DiffStatsTest(unittest.TestCase):
+    def reference(self, a, b):
+        d = a.astype(np.int64) - b.astype(np.int64)
+        return int(np.count_nonzero(d)), int(np.abs(d).sum()), int((d * d).sum())
+
+    def test_matches_reference(self):
+        a = random_pixels((37, 41, 3), seed=1)
+        b = random_pixels((37, 41, 3), seed=2)
+        b[:5] = a[:5]
+        self.assertEqual(diff_stats(a, b), self.reference(a, b))
+
+    def test_strided_and_read_only(self):
+        a = random_pixels((30, 40), seed=3)
+        b = random_pixels((30, 40), seed=4)
+        b.setflags(write=False)
+        self.assertEqual(diff_stats(a[:, ::2], b[:, 1::2]), self.reference(a[:, ::2], b[:, 1::2]))
+
+    def test_identical(self):
+        a = random_pixels((8, 8, 3))
+        self.assertEqual(diff_stats(a, a.copy()), (0, 0, 0))
+
+    def test_shape_mismatch(self):
+        with self.assertRaises(ValueError):
+            diff_stats(random_pixels((100, 100, 3)), random_pixels((10, 10, 3)))
+        with self.assertRaises(ValueError):
+            diff_stats(random_pixels(300), random_pixels((10, 10, 3)))
+
+class PearsonTest(unittest.TestCase):
+    def assert_matches_corrcoef(self, x, y):
+        expected = np.corrcoef(x.ravel().astype(np.float64), y.ravel().astype(np.float64))[0, 1]
+        self.assertAlmostEqual(pearson(x, y), expected, places=9)
+
+    def test_adjacent_pixel_views(self):
+        # The horizontal and vertical pairs metrics.py passes in
+        smooth = np.add.outer(np.arange(60), np.arange(50)).astype(np.uint8)
+        noisy = random_pixels((60, 50, 3))
+        for img in (smooth, noisy, noisy[..., 1]):
+            self.assert_matches_corrcoef(img[:, :-1], img[:, 1:])
+            self.assert_matches_corrcoef(img[:-1], img[1:])
+
+    def test_flat(self):
+        a = random_pixels(500, seed=1)
+        b = (a // 2 + random_pixels(500, seed=2) // 2).astype(np.uint8)
+        self.assert_matches_corrcoef(a, b)
+        self.assert_matches_corrcoef(a[::3], b[1::3])
+
+    def test_constant(self):
+        self.assertEqual(pearson(np.zeros((4, 4)), random_pixels((4, 4))), 0.0)
+        self.assertEqual(pearson(np.zeros(1), np.zeros(1)), 0.0)
+
+    def test_shape_mismatch(self):
+        img = random_pixels((20, 20))
+        with self.assertRaises(ValueError):
+            pearson(img[:, :-1], img[1:])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,71 @@
+# Files written before the GCM, KDF and scramble changes: AES-256-CBC with
+# PKCS7 padding under the UTF-8 key truncated or zero-padded to 32 bytes,
+# pixels permuted by RandomState(42), metadata without version fields, and
+# the stego payload at 1 LSB per cover byte. They must keep decrypting.
+import json
+import os
+import unittest
+import numpy as np
+from cryptography.hazmat.primitives.ciphers import Cipher, algorithms, modes
+from cryptography.hazmat.primitives.padding import PKCS7
+from support import TempDirTestCase, random_pixels, read_pixels
+import encryption
+import steganography
+
+def legacy_payload(pixels, mode, key):
+    """metadata_length + metadata + IV + ciphertext, as the original scripts wrote it"""
+    metadata = {'mode': mode, 'shape': list(pixels.shape), 'dtype': str(pixels.dtype)}
+    flat = pixels.reshape(-1)
+    scrambled = flat[np.random.RandomState(42).permutation(flat.size)]
+
+    padder = PKCS7(128).padder()
+    padded = padder.update(scrambled.tobytes()) + padder.finalize()
+    iv = os.urandom(16)
+    key_bytes = key.encode('utf-8')[:32].ljust(32, b'\0')
+    encryptor = Cipher(algorithms.AES(key_bytes), modes.CBC(iv)).encryptor()
+    ciphertext = encryptor.update(padded) + encryptor.finalize()
+
+    metadata_json = json.dumps(metadata).encode('utf-8')
+    return len(metadata_json).to_bytes(4, byteorder='big') + metadata_json + iv + ciphertext
+
+class LegacyEncryptionTest(TempDirTestCase):
+    def decrypt(self, pixels, mode, key):
+        path = os.path.join(self.dir, 'legacy_encrypted.bin')
+        with open(path, 'wb') as f:
+            f.write(legacy_payload(pixels, mode, key))
+        result = encryption.decrypt_image(path, key)
+        self.assertTrue(result['success'], result.get('error'))
+        return read_pixels(result['decrypted_path'])
+
+    def test_rgb(self):
+        pixels = random_pixels((23, 31, 3))
+        np.testing.assert_array_equal(self.decrypt(pixels, 'RGB', 'legacykey'), pixels)
+
+    def test_grayscale(self):
+        pixels = random_pixels((17, 16))
+        np.testing.assert_array_equal(self.decrypt(pixels, 'L', 'legacykey'), pixels)
+
+    def test_long_key_truncated(self):
+        pixels = random_pixels((9, 7, 3))
+        np.testing.assert_array_equal(self.decrypt(pixels, 'RGB', 'k' * 40), pixels)
+
+class LegacySteganographyTest(TempDirTestCase):
+    def test_round_trip(self):
+        pixels = random_pixels((20, 25, 3))
+        payload = np.frombuffer(legacy_payload(pixels, 'RGB', 'legacykey'), dtype=np.uint8)
+
+        # 32-bit bit count header, then the payload bits, 1 per cover byte
+        bits = np.concatenate([
+            np.unpackbits(np.array([payload.size * 8], dtype='>u4').view(np.uint8)),
+            np.unpackbits(payload)
+        ])
+        cover = random_pixels((70, 70, 3)).reshape(-1)
+        cover[:bits.size] = (cover[:bits.size] & 0xFE) | bits
+        stego_path = self.save_image('legacy_stego.png', cover.reshape(70, 70, 3))
+
+        result = steganography.decrypt_from_steganography(stego_path, 'legacykey')
+        self.assertTrue(result['success'], result.get('error'))
+        np.testing.assert_array_equal(read_pixels(result['decrypted_path']), pixels)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,44 @@
+import unittest
+import numpy as np
+from support import random_pixels
+import metrics
+
+class DifferenceMetricsTest(unittest.TestCase):
+    def test_npcr_uaci(self):
+        a = random_pixels((30, 40, 3), seed=1)
+        b = random_pixels((30, 40, 3), seed=2)
+        d = a.astype(np.float64) - b.astype(np.float64)
+        npcr, uaci = metrics.calculate_npcr_uaci(a, b)
+        self.assertAlmostEqual(npcr, np.mean(d != 0) * 100)
+        self.assertAlmostEqual(uaci, np.mean(np.abs(d) / 255) * 100)
+
+    def test_mse_psnr(self):
+        a = random_pixels((30, 40), seed=3)
+        b = random_pixels((30, 40), seed=4)
+        mse = np.mean((a.astype(np.float64) - b.astype(np.float64)) ** 2)
+        result = metrics.calculate_mse_psnr(a, b)
+        self.assertAlmostEqual(result[0], mse)
+        self.assertAlmostEqual(result[1], 10 * np.log10(255 ** 2 / mse))
+        self.assertEqual(metrics.calculate_mse_psnr(a, a), (0.0, 100.0))
+
+class CorrelationTest(unittest.TestCase):
+    def test_uses_every_pair(self):
+        # Full coefficient over all adjacent pairs, no random sampling
+        img = np.add.outer(np.arange(50), 2 * np.arange(60)).astype(np.uint8) ^ random_pixels((50, 60), seed=5) & 7
+        gray = img.astype(np.float64)
+        horizontal = np.corrcoef(gray[:, :-1].ravel(), gray[:, 1:].ravel())[0, 1]
+        vertical = np.corrcoef(gray[:-1].ravel(), gray[1:].ravel())[0, 1]
+        self.assertAlmostEqual(metrics.calculate_correlation(img), horizontal, places=9)
+        self.assertAlmostEqual(metrics.calculate_correlation(img, 'vertical'), vertical, places=9)
+        self.assertEqual(metrics.calculate_correlation(img), metrics.calculate_correlation(img))
+
+    def test_rgb_averaged(self):
+        img = random_pixels((20, 30, 3))
+        gray = np.mean(img, axis=2).astype(np.uint8)
+        self.assertEqual(metrics.calculate_correlation(img), metrics.calculate_correlation(gray))
+
+    def test_single_row(self):
+        self.assertEqual(metrics.calculate_correlation(random_pixels((1, 1))), 0.0)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,141 @@
+import os
+import unittest
+import numpy as np
+from cryptography.hazmat.primitives.ciphers import Cipher, algorithms, modes
+from support import TempDirTestCase, random_pixels, read_pixels
+from kernels import embed_lsb, extract_lsb
+import steganography
+
+def reference_embed(flat, data, start, depth):
+    """Bit-by-bit embed: data bits MSB first, depth bits per cover byte"""
+    bits = np.unpackbits(data).reshape(-1, depth)
+    symbols = (bits << np.arange(depth - 1, -1, -1, dtype=np.uint8)).sum(axis=1).astype(np.uint8)
+    out = flat.copy()
+    end = start + symbols.size
+    out[start:end] = (out[start:end] & (0xFF ^ ((1 << depth) - 1))) | symbols
+    return out
+
+class LsbKernelTest(unittest.TestCase):
+    def test_embed_matches_reference(self):
+        for depth in (1, 2):
+            cover = random_pixels(1000, seed=depth)
+            data = random_pixels(50, seed=10 + depth)
+            expected = reference_embed(cover, data, 32, depth)
+            embed_lsb(cover, data, 32, depth)
+            np.testing.assert_array_equal(cover, expected)
+
+    def test_extract_inverts_embed(self):
+        for depth in (1, 2):
+            cover = random_pixels(1000, seed=depth)
+            data = random_pixels(50, seed=10 + depth)
+            embed_lsb(cover, data, 40, depth)
+            np.testing.assert_array_equal(extract_lsb(cover, 40, data.size, depth), data)
+
+    def test_read_only_cover(self):
+        cover = random_pixels(400)
+        data = random_pixels(20, seed=1)
+        embed_lsb(cover, data, 0)
+        cover.setflags(write=False)
+        np.testing.assert_array_equal(extract_lsb(cover, 0, data.size), data)
+
+class LsbEmbedTest(unittest.TestCase):
+    def test_round_trip(self):
+        payload = os.urandom(333)
+        for depth in (1, 2):
+            cover = random_pixels((40, 50, 3), seed=depth)
+            stego = steganography.embed_lsb_fast(cover.copy(), payload, depth)
+            self.assertEqual(steganography.extract_lsb_fast(stego), payload)
+
+    def test_header(self):
+        # The header is always 1 bit per byte; depth 2 sets the flag bit
+        for depth in (1, 2):
+            stego = steganography.embed_lsb_fast(random_pixels((20, 20, 3)), b'abc', depth)
+            flat = np.asarray(stego).reshape(-1)
+            header = int(extract_lsb(flat, 0, 4).view('>u4')[0])
+            flag = steganography.LSB_DEPTH2_FLAG if depth == 2 else 0
+            self.assertEqual(header, 24 | flag)
+
+    def test_cover_too_small(self):
+        with self.assertRaises(ValueError):
+            steganography.embed_lsb_fast(random_pixels((4, 4, 3)), bytes(64))
+
+    def test_fused_embed(self):
+        # Encrypting while embedding must store exactly prefix + tag + ciphertext
+        key = os.urandom(32)
+        nonce = os.urandom(12)
+        prefix = b'prefix'
+        plain = random_pixels(steganography.EMBED_CHUNK + 1000)
+
+        encryptor = Cipher(algorithms.AES(key), modes.GCM(nonce)).encryptor()
+        ciphertext = encryptor.update(plain.tobytes()) + encryptor.finalize()
+        expected = prefix + encryptor.tag + ciphertext
+
+        for depth in (1, 2):
+            cover = random_pixels((800, 900, 3), seed=depth)
+            encryptor = Cipher(algorithms.AES(key), modes.GCM(nonce)).encryptor()
+            stego, entropy = steganography.embed_encrypted_fast(cover, prefix, plain, encryptor, depth)
+            self.assertEqual(steganography.extract_lsb_fast(stego), expected)
+            self.assertGreater(entropy, 7.9)
+
+class SteganographyRoundTripTest(TempDirTestCase):
+    def test_round_trip(self):
+        secret = random_pixels((30, 40, 3))
+        secret_path = self.save_image('secret.png', secret)
+        for depth in (1, 2):
+            cover_path = self.save_image('cover.png', random_pixels((120, 130, 3), seed=depth))
+            result = steganography.encrypt_with_steganography(secret_path, cover_path, 'k3y', 'logistic', depth)
+            self.assertTrue(result['success'], result.get('error'))
+
+            result = steganography.decrypt_from_steganography(result['stego_path'], 'k3y')
+            self.assertTrue(result['success'], result.get('error'))
+            np.testing.assert_array_equal(read_pixels(result['decrypted_path']), secret)
+
+    def test_wrong_key(self):
+        secret_path = self.save_image('secret.png', random_pixels((10, 10, 3)))
+        cover_path = self.save_image('cover.png', random_pixels((40, 40, 3)))
+        result = steganography.encrypt_with_steganography(secret_path, cover_path, 'k3y')
+        result = steganography.decrypt_from_steganography(result['stego_path'], 'other')
+        self.assertFalse(result['success'])
+
+    def test_run_command_converts_arguments(self):
+        # The worker passes strings or already-decoded JSON values
+        secret_path = self.save_image('secret.png', random_pixels((10, 10, 3)))
+        cover_path = self.save_image('cover.png', random_pixels((40, 40, 3)))
+        for depth in ('2', 2):
+            result = steganography.run_command(['encrypt', secret_path, cover_path, 'k3y', 'logistic', depth])
+            self.assertTrue(result['success'], result.get('error'))
+        self.assertFalse(steganography.run_command(['encrypt', secret_path])['success'])
+
+    def test_unsupported_depth(self):
+        secret_path = self.save_image('secret.png', random_pixels((10, 10, 3)))
+        cover_path = self.save_image('cover.png', random_pixels((40, 40, 3)))
+        for depth in (0, -1, 3, 8):
+            result = steganography.encrypt_with_steganography(secret_path, cover_path, 'k3y', 'logistic', depth)
+            self.assertEqual(result, {'success': False, 'error': f'Unsupported LSB depth: {depth}'})
+            result = steganography.run_command(['encrypt-batch', [[secret_path, cover_path]], 'k3y', 'logistic', str(depth)])
+            self.assertEqual(result, {'success': False, 'error': f'Unsupported LSB depth: {depth}'})
+
+class EncryptBatchTest(TempDirTestCase):
+    def test_results_in_order(self):
+        secrets = [random_pixels((10 + i, 12, 3), seed=i) for i in range(3)]
+        pairs = [
+            [self.save_image(f'secret{i}.png', secret), self.save_image(f'cover{i}.png', random_pixels((50, 50, 3)))]
+            for i, secret in enumerate(secrets)
+        ]
+        # A bad pair fails on its own without sinking the batch
+        pairs.append([os.path.join(self.dir, 'missing.png'), pairs[0][1]])
+
+        result = steganography.encrypt_batch(pairs, 'k3y', 'logistic', 2, max_workers=2)
+        self.assertTrue(result['success'], result.get('error'))
+        self.assertEqual([r['success'] for r in result['results']], [True, True, True, False])
+
+        for secret, job in zip(secrets, result['results']):
+            decrypted = steganography.decrypt_from_steganography(job['stego_path'], 'k3y')
+            self.assertTrue(decrypted['success'], decrypted.get('error'))
+            np.testing.assert_array_equal(read_pixels(decrypted['decrypted_path']), secret)
+
+    def test_empty(self):
+        self.assertEqual(steganography.encrypt_batch([], 'k3y'), {'success': True, 'results': []})
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,52 @@
+import json
+import os
+import subprocess
+import sys
+import unittest
+import numpy as np
+from support import TempDirTestCase, random_pixels, read_pixels
+import worker
+
+class DispatchTest(TempDirTestCase):
+    def test_encryption_round_trip(self):
+        pixels = random_pixels((12, 15, 3))
+        path = self.save_image('secret.png', pixels)
+        result = worker.dispatch(['encryption', 'encrypt', path, 'k3y'])
+        self.assertTrue(result['success'], result.get('error'))
+        result = worker.dispatch(['encryption', 'decrypt', result['encrypted_path'], 'k3y'])
+        self.assertTrue(result['success'], result.get('error'))
+        np.testing.assert_array_equal(read_pixels(result['decrypted_path']), pixels)
+
+    def test_steganography_converts_like_the_cli(self):
+        secret_path = self.save_image('secret.png', random_pixels((10, 10, 3)))
+        cover_path = self.save_image('cover.png', random_pixels((40, 40, 3)))
+        result = worker.dispatch(['steganography', 'encrypt', secret_path, cover_path, 'k3y', 'logistic', '2'])
+        self.assertTrue(result['success'], result.get('error'))
+        result = worker.dispatch(['steganography', 'encrypt-batch', [[secret_path, cover_path]], 'k3y'])
+        self.assertTrue(result['success'], result.get('error'))
+
+    def test_metrics(self):
+        path = self.save_image('a.png', random_pixels((16, 16, 3)))
+        other = self.save_image('b.png', random_pixels((16, 16, 3), seed=1))
+        self.assertEqual(worker.dispatch(['calculate_metrics', 'all', path, other])['key_space'], 256)
+        self.assertTrue(worker.dispatch(['metrics', 'steganography', path, other])['success'])
+
+    def test_errors_become_results(self):
+        path = self.save_image('a.png', random_pixels((16, 16, 3)))
+        small = self.save_image('b.png', random_pixels((4, 4, 3)))
+        for command in (['bogus', 'x'], ['encryption', 'encrypt'], [],
+                        ['calculate_metrics', 'all', path, small]):
+            self.assertFalse(worker.dispatch(command)['success'])
+
+class WorkerProcessTest(unittest.TestCase):
+    def test_ndjson(self):
+        requests = [{'id': 1, 'command': ['bogus', 'x']}, 'not json', {'id': 2}]
+        stdin = '\n'.join(r if isinstance(r, str) else json.dumps(r) for r in requests) + '\n'
+        script = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'worker.py')
+        proc = subprocess.run([sys.executable, script], input=stdin, capture_output=True, text=True, timeout=120)
+        replies = [json.loads(line) for line in proc.stdout.splitlines()]
+        self.assertEqual([reply['id'] for reply in replies], [1, None, 2])
+        self.assertFalse(any(reply['result']['success'] for reply in replies))
+
+if __name__ == '__main__':
+    unittest.main()
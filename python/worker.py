@@ -0,0 +1,64 @@
+# python/worker.py - long-lived worker so imports happen once per server, not per request
+import sys
+import json
+import encryption
+import steganography
+import metrics
+import calculate_metrics
+
+# (script, command) -> function, mirroring each script's CLI arguments
+COMMANDS = {
+    ('encryption', 'encrypt'): encryption.encrypt_image,
+    ('encryption', 'decrypt'): encryption.decrypt_image,
+    ('metrics', 'encryption'): metrics.analyze_encryption,
+    ('metrics', 'steganography'): metrics.analyze_steganography,
+    ('calculate_metrics', 'all'): calculate_metrics.calculate_all_metrics,
+}
+
+# script -> CLI argument parser, for scripts whose command line converts
+# arguments (numbers, JSON); the worker goes through the same parser so it
+# accepts exactly what the CLI does
+PARSERS = {
+    'steganography': steganography.run_command,
+}
+
+def dispatch(command):
+    """Run one command given as [script, command, *args]"""
+    try:
+        script, name, *args = command
+        if script in PARSERS:
+            return PARSERS[script]([name, *args])
+        func = COMMANDS.get((script, name))
+        if func is None:
+            return {'success': False, 'error': f'Unknown command: {script} {name}'}
+        return func(*args)
+    except Exception as e:
+        return {'success': False, 'error': str(e)}
+
+def main():
+    """
+    Read newline-delimited JSON requests {"id": ..., "command": [...]} from stdin
+    and answer each with one JSON line {"id": ..., "result": {...}} on stdout
+    """
+    out = sys.stdout
+    # Anything the commands print goes to stderr so stdout carries only replies
+    sys.stdout = sys.stderr
+
+    for line in sys.stdin:
+        line = line.strip()
+        if not line:
+            continue
+
+        request_id = None
+        try:
+            request = json.loads(line)
+            request_id = request.get('id')
+            result = dispatch(request['command'])
+        except (ValueError, KeyError, AttributeError) as e:
+            result = {'success': False, 'error': f'Invalid request: {e}'}
+
+        out.write(json.dumps({'id': request_id, 'result': result}) + '\n')
+        out.flush()
+
+if __name__ == '__main__':
+    main()
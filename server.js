@@ -60,7 +60,7 @@ app.get('/', (req, res) => {
     message: '✅ Hybrid Chaotic-AES Encryption API is running',
     timestamp: new Date().toISOString(),
     features: {
-      encryption: 'AES-256-CBC',
+      encryption: 'AES-256-GCM',
       scrambling: 'Chaotic Maps',
       steganography: 'LSB Technique'
     }
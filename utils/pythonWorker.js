@@ -0,0 +1,91 @@
+const { spawn } = require('child_process');
+const path = require('path');
+const readline = require('readline');
+
+// One long-lived Python process (python/worker.py) serves every request, so
+// interpreter start-up and the numpy/PIL/cryptography imports are paid once.
+const PYTHON = process.env.PYTHON_PATH || 'python3';
+const WORKER_SCRIPT = path.join(__dirname, '..', 'python', 'worker.py');
+// A request still unanswered after this long is failed and the worker
+// restarted, so one stuck job cannot hold up every request queued behind it
+const TIMEOUT_MS = Number(process.env.PYTHON_TIMEOUT_MS) || 5 * 60 * 1000;
+
+let worker = null;
+let nextId = 1;
+const pending = new Map();
+
+function failAll(child, err) {
+  // Ignore late events from a worker that has already been replaced
+  if (worker !== child) {
+    return;
+  }
+  for (const request of pending.values()) {
+    clearTimeout(request.timer);
+    request.reject(err);
+  }
+  pending.clear();
+  worker = null;
+}
+
+function startWorker() {
+  const child = spawn(PYTHON, [WORKER_SCRIPT], { stdio: ['pipe', 'pipe', 'inherit'] });
+  worker = child;
+
+  readline.createInterface({ input: child.stdout }).on('line', (line) => {
+    let message;
+    try {
+      message = JSON.parse(line);
+    } catch (err) {
+      console.error('❌ Unparseable Python worker output:', line);
+      return;
+    }
+
+    const request = pending.get(message.id);
+    if (request) {
+      pending.delete(message.id);
+      clearTimeout(request.timer);
+      request.resolve(message.result);
+    }
+  });
+
+  // Fail whatever was in flight; the next call spawns a fresh worker
+  child.on('exit', (code) => {
+    failAll(child, new Error(`Python worker exited with code ${code}`));
+  });
+  // Spawn failures (e.g. ENOENT for a bad PYTHON_PATH) and writes to a
+  // worker that already died (EPIPE) arrive as 'error' events, which would
+  // otherwise crash the server
+  child.on('error', (err) => {
+    failAll(child, new Error(`Python worker failed: ${err.message}`));
+  });
+  child.stdin.on('error', (err) => {
+    failAll(child, new Error(`Python worker failed: ${err.message}`));
+    child.kill();
+  });
+}
+
+/**
+ * Run a Python command, e.g. runPython('encryption', 'encrypt', imagePath, key).
+ * Arguments mirror the per-script CLIs; resolves with the script's JSON result.
+ */
+function runPython(...command) {
+  if (!worker) {
+    startWorker();
+  }
+
+  const id = nextId++;
+  const child = worker;
+  return new Promise((resolve, reject) => {
+    const timer = setTimeout(() => {
+      pending.delete(id);
+      reject(new Error(`Python command timed out after ${TIMEOUT_MS} ms: ${command.slice(0, 2).join(' ')}`));
+      // Replace the busy worker, failing the requests queued behind it
+      failAll(child, new Error('Python worker restarted after a timed-out command'));
+      child.kill();
+    }, TIMEOUT_MS);
+    pending.set(id, { resolve, reject, timer });
+    child.stdin.write(JSON.stringify({ id, command }) + '\n');
+  });
+}
+
+module.exports = { runPython };